@@ -5,17 +5,23 @@ from livekit.plugins import (
     noise_cancellation,
 )
 
+import json
 from datetime import datetime, timedelta
 
 import budget_tools
 import budget_tools
 print("budget_tools loaded from:", budget_tools.__file__)
 from budget_tools import BudgetSheetsManager
+from async_budget_tools import AsyncBudgetSheetsManager
+from manager_pool import ManagerPool
 print("BudgetSheetsManager loaded from:", BudgetSheetsManager.__module__)
 print("Methods:", dir(BudgetSheetsManager))
 
-manager = BudgetSheetsManager()
-print(manager.get_all_existing_categories())
+# One manager per spreadsheet, shared by every session in this worker process.
+# The default sheet's manager is held for the life of the process; sessions for
+# other households lease theirs from the pool (see entrypoint).
+pool = ManagerPool()
+manager = pool.acquire()
 
 
 #result = manager.find_matching_transactions(description="groceries", amount=75.50)
@@ -36,6 +42,7 @@ print(manager.get_all_existing_categories())
 
 
 import asyncio
+import time
 
 class ToolError(Exception):
     """Custom exception to signal tool execution errors to the agent framework."""
@@ -43,12 +50,15 @@ class ToolError(Exception):
 
 
 class Assistant(Agent):
-    def __init__(self) -> None:
+    def __init__(self, budget_manager=None) -> None:
         super().__init__(instructions="You are a helpful voice AI assistant.")
         try:
-            self.budget_manager = BudgetSheetsManager()
-            print("BudgetSheetsManager initialized successfully.")
-            print("BudgetSheetsManager methods:", dir(self.budget_manager))
+            started = time.perf_counter()
+            # Tools run on the LiveKit event loop, so Sheets I/O must be awaited
+            # rather than called through the blocking googleapiclient service.
+            self.budget_manager = AsyncBudgetSheetsManager(manager=budget_manager or manager)
+            print(f"[TIMING] AsyncBudgetSheetsManager initialized in {(time.perf_counter() - started) * 1000:.1f} ms.")
+            print("AsyncBudgetSheetsManager methods:", dir(self.budget_manager))
         except Exception as e:
             print(f"Error initializing BudgetSheetsManager: {e}")
             raise
@@ -62,18 +72,17 @@ class Assistant(Agent):
             date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
 
         if category:
-            existing_categories_response = self.budget_manager.get_all_existing_categories()
-            if existing_categories_response["status"] == "error":
-                return existing_categories_response
-            existing_categories = [c.lower() for c in existing_categories_response["categories"]]
+            category_response = await self.budget_manager.has_category(category)
+            if category_response["status"] == "error":
+                return category_response
 
-            if category.lower() not in existing_categories:
+            if not category_response["exists"]:
                 return {
                     "status": "error",
-                    "message": f"Category '{category}' does not exist. Would you like to create it or choose an existing category? Existing categories: {', '.join(existing_categories_response['categories'])}."
+                    "message": f"Category '{category}' does not exist. Would you like to create it or choose an existing category? Existing categories: {', '.join(category_response['categories'])}."
                 }
 
-        return self.budget_manager.add_transaction(date, description, amount, transaction_type, category)
+        return await self.budget_manager.add_transaction(date, description, amount, transaction_type, category)
 
 
 
@@ -106,67 +115,101 @@ class Assistant(Agent):
 
 
     @function_tool()
-    async def edit_transaction(self, context: RunContext, row_index: int, date: str = None, description: str = None, amount: float = None, transaction_type: str = None, category: str = None):
-        """Edits an existing transaction in the budget."""
+    async def edit_transaction(self, context: RunContext, row_index: int = None, date: str = None, description: str = None, amount: float = None, transaction_type: str = None, category: str = None, transaction_id: str = None):
+        """Edits an existing transaction in the budget. Identify it by transaction_id (the id returned by get_transactions) or row_index; the other arguments are the new values."""
+        if transaction_id is None and row_index is None:
+            # Without either, the manager would take the new values as search criteria.
+            return {"status": "error", "message": "Find the transaction with get_transactions first, then pass its transaction_id."}
         if date:
             if date.lower() == "today":
                 date = datetime.now().strftime("%Y-%m-%d")
             elif date.lower() == "yesterday":
                 date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
 
-        print(f"DEBUG: edit_transaction called with row_index={row_index}, date={date}, description={description}, amount={amount}, transaction_type={transaction_type}, category={category}")
-        return self.budget_manager.edit_transaction(row_index, date, description, amount, transaction_type, category)
+        print(f"DEBUG: edit_transaction called with row_index={row_index}, transaction_id={transaction_id}, date={date}, description={description}, amount={amount}, transaction_type={transaction_type}, category={category}")
+        return await self.budget_manager.edit_transaction(row_index, date, description, amount, transaction_type, category, transaction_id)
 
 
     @function_tool()
-    async def delete_transaction(self, context: RunContext, description: str = None, category: str = None, amount: float = None, date: str = None):
-        """Deletes a transaction from the budget based on matching criteria."""
-        all_transactions_response = self.budget_manager.get_all_transactions()
-        if all_transactions_response["status"] == "error":
-            return all_transactions_response
-
-        all_transactions = all_transactions_response["transactions"]
-        matching_transactions = []
-
-        for t in all_transactions:
-            match = True
-            if description and description.lower() not in t['description'].lower():
-                match = False
-            if category and category.lower() not in t['category'].lower():
-                match = False
-            if amount and float(amount) != float(t['amount']):
-                match = False
-            if date and date != t['date']:
-                match = False
-
-            if match:
-                matching_transactions.append(t)
+    async def delete_transaction(self, context: RunContext, description: str = None, category: str = None, amount: float = None, date: str = None, delete_all: bool = False, confirm: bool = False, transaction_ids: list[str] = None):
+        """Deletes a transaction from the budget based on matching criteria. Set delete_all to remove every match at once; that first returns the matches and their transaction_ids, and only a second call with confirm=True and those transaction_ids deletes them."""
+        if delete_all and confirm:
+            # Exactly the rows the user was shown; searching again could match different ones.
+            if not transaction_ids:
+                return {"status": "error", "message": "Pass the transaction_ids from the confirm response to delete them."}
+            return await self.budget_manager.delete_transactions_by_id(transaction_ids)
+        if delete_all and not any(value not in (None, "") for value in (description, category, amount, date)):
+            return {"status": "error", "message": "delete_all needs at least one of description, category, amount or date."}
+
+        search_response = await self.budget_manager.search_transactions(
+            date=date or None, description=description or None, amount=amount or None, category=category or None)
+        if search_response["status"] == "error":
+            return search_response
+
+        matching_transactions = search_response["matches"]
 
         if len(matching_transactions) == 0:
             return {"status": "error", "message": "No matching transaction found."}
+        elif delete_all:
+            transaction_ids = [t.get('id') for t in matching_transactions]
+            if not all(transaction_ids):
+                return {"status": "error", "message": "Some matching transactions don't have ids yet, so they can't be deleted together. Try again in a moment."}
+            return {"status": "confirm", "message": f"{len(matching_transactions)} transactions match. Ask the user to confirm, then call again with delete_all=True, confirm=True and these transaction_ids to delete them all.",
+                    "matches": matching_transactions, "transaction_ids": transaction_ids}
         elif len(matching_transactions) > 1:
             return {"status": "ambiguous", "message": f"Multiple transactions match your criteria. Please be more specific. Matching transactions: {matching_transactions}"}
         else:
             transaction_to_delete = matching_transactions[0]
-            row_index = transaction_to_delete['_row_index']
-            return self.budget_manager.delete_transaction(row_index)
+            if transaction_to_delete.get('id'):
+                return await self.budget_manager.delete_transaction(transaction_id=transaction_to_delete['id'])
+            return await self.budget_manager.delete_transaction(transaction_to_delete['_row_index'])
 
     @function_tool()
     async def modify_budget(self, context: RunContext, category: str, budget_limit: float):
         """Sets or updates the budget limit for a specific category."""
-        return self.budget_manager.modify_budget(category, budget_limit)
+        return await self.budget_manager.modify_budget(category, budget_limit)
 
     @function_tool()
-    async def get_transactions(self, context: RunContext, date: str = None, description: str = None, amount: float = None, transaction_type: str = None, category: str = None):
-        """Retrieves transactions based on optional filters."""
-        import asyncio
-        return await asyncio.to_thread(self.budget_manager.get_all_transactions)
+    async def summarize_transactions(self, context: RunContext, group_by: str = "category", start_date: str = None, end_date: str = None, transaction_type: str = None, category: str = None):
+        """Totals transaction amounts by category, transaction_type or month, optionally within a date range."""
+        return await self.budget_manager.summarize_transactions(group_by, start_date, end_date, transaction_type, category)
+
+    @function_tool()
+    async def budget_status(self, context: RunContext, category: str = None, month: str = None):
+        """Shows each category's budget limit, amount spent and amount remaining for a month (YYYY-MM, defaults to the current month)."""
+        return await self.budget_manager.budget_status(category=category, month=month)
+
+    @function_tool()
+    async def get_transactions(self, context: RunContext, start_date: str = None, end_date: str = None, date: str = None, description: str = None, amount: float = None, transaction_type: str = None, category: str = None):
+        """Retrieves transactions based on optional filters. Use start_date and end_date (YYYY-MM-DD, inclusive) for a date range, or date for a single day."""
+        if date:
+            start_date = end_date = date
+        return await self.budget_manager.query(start_date=start_date, end_date=end_date, category=category, transaction_type=transaction_type, description=description, amount=amount)
+
+
+def _session_spreadsheet_id(ctx):
+    # Dispatches for a particular household carry {"spreadsheet_id": ...} as job metadata.
+    try:
+        metadata = json.loads(ctx.job.metadata or "{}")
+    except (AttributeError, ValueError):
+        return None
+    return metadata.get("spreadsheet_id") if isinstance(metadata, dict) else None
 
 
 async def entrypoint(ctx: agents.JobContext):
     try:
         print("Starting entrypoint")
 
+        spreadsheet_id = _session_spreadsheet_id(ctx)
+        tenant = manager
+        if spreadsheet_id and spreadsheet_id != manager.spreadsheet_id:
+            # A new tenant bootstraps over the network, so keep it off the event loop.
+            tenant = await asyncio.to_thread(pool.acquire, spreadsheet_id)
+
+            async def release_tenant():
+                await asyncio.to_thread(pool.release, tenant)
+            ctx.add_shutdown_callback(release_tenant)
+
         session = AgentSession(
             llm=openai.realtime.RealtimeModel(
                 voice="coral"
@@ -176,9 +219,13 @@ async def entrypoint(ctx: agents.JobContext):
         await ctx.connect()
         print("Connected to JobContext")
 
+        assistant = Assistant(tenant)
+        # The async wrapper owns an httpx client; close it when the session ends.
+        ctx.add_shutdown_callback(assistant.budget_manager.aclose)
+
         await session.start(
             room=ctx.room,
-            agent=Assistant(),
+            agent=assistant,
             room_input_options=RoomInputOptions(
                 noise_cancellation=noise_cancellation.BVC(),
             ),
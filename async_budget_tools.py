@@ -0,0 +1,423 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import httpx
+
+from budget_tools import BudgetSheetsManager, DEFAULT_PAGE_SIZE, SHEET_PROPERTIES_FIELDS
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+
+
+class AsyncBudgetSheetsManager:
+    """Same methods as BudgetSheetsManager, but every Sheets call is awaited on httpx.
+
+    Cache and metadata bookkeeping is delegated to a wrapped BudgetSheetsManager,
+    so sync and async callers that share one manager also share its ledger cache.
+    Only the transport differs: requests go straight to the Sheets REST API on an
+    httpx.AsyncClient, so they never block the event loop or need a thread.
+    """
+
+    def __init__(self, manager=None, timeout=30.0, **manager_kwargs):
+        self.manager = manager or BudgetSheetsManager(**manager_kwargs)
+        self.spreadsheet_id = self.manager.spreadsheet_id
+        self._client = httpx.AsyncClient(timeout=timeout)
+        self._token_lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _authorization_header(self):
+        creds = self.manager.creds
+        async with self._token_lock:
+            if not creds.valid:
+                # Refresh the OAuth token over the same async client instead of
+                # google-auth's blocking requests transport.
+                response = await self._client.post(creds.token_uri, data={
+                    "grant_type": "refresh_token",
+                    "client_id": creds.client_id,
+                    "client_secret": creds.client_secret,
+                    "refresh_token": creds.refresh_token,
+                })
+                response.raise_for_status()
+                payload = response.json()
+                creds.token = payload["access_token"]
+                expires_in = payload.get("expires_in", 3600)
+                creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
+        return {"Authorization": f"Bearer {creds.token}"}
+
+    async def _request(self, method, path, params=None, json=None):
+        async def send():
+            response = await self._client.request(
+                method, f"{SHEETS_API_URL}/{self.spreadsheet_id}{path}",
+                params=params, json=json, headers=await self._authorization_header())
+            response.raise_for_status()
+            return response.json()
+
+        # Shares the sync manager's gateway, so both count against one quota.
+        return await self.manager.gateway.acall(send, method)
+
+    async def _single_flight(self, key, make_coroutine):
+        # The manager's SingleFlight, so every wrapper around it (one per agent
+        # session) and its sync callers share identical in-flight reads.
+        return await self.manager._single_flight.ado(key, make_coroutine)
+
+    async def _get_values(self, a1_range):
+        return await self._single_flight(
+            ("values", a1_range), lambda: self._request("GET", f"/values/{quote(a1_range, safe='')}"))
+
+    async def add_transaction(self, date: str, description: str, amount: float, transaction_type: str, category: str = ""):
+        if self.manager.journal is not None:
+            # Journaled writes are a local fsync; the manager's replay thread sends them.
+            return await asyncio.to_thread(self.manager.add_transaction, date, description, amount, transaction_type, category)
+        try:
+            row = self.manager._transaction_row(date, description, amount, transaction_type, category)
+            result = await self._request(
+                "POST", f"/values/{quote('Transactions!A:F', safe='')}:append",
+                params={"valueInputOption": "USER_ENTERED"}, json={"values": [row]})
+            row_index = (await asyncio.to_thread(
+                self.manager._apply_appended_rows, [row], result.get('updates', {}).get('updatedRange')))[0]
+
+            return {"status": "success", "message": f"{len(row)} cells updated. Transaction added.", "row_index": row_index}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def get_all_transactions(self, force_refresh=False):
+        try:
+            ledger = await self._ensure_ledger(force_refresh)
+            return {"status": "success", "transactions": await asyncio.to_thread(self.manager._copy_ledger, ledger)}
+
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def iter_transactions(self, page_size=DEFAULT_PAGE_SIZE):
+        """Async generator over the sheet's transactions, page_size rows per request."""
+        row_count = (await self._get_sheet_properties()).get("Transactions", {}).get("rowCount", 0)
+        first_row = 2
+        while True:
+            last_row = first_row + page_size - 1
+            result = await self._get_values(f"Transactions!A{first_row}:F{last_row}")
+            values = result.get('values', [])
+            for txn in await asyncio.to_thread(self.manager._parse_transactions, values, first_row):
+                yield txn
+            if self.manager._is_last_page(values, last_row, page_size, row_count):
+                return
+            first_row = last_row + 1
+
+    async def _ensure_ledger(self, force_refresh=False):
+        # Everything that takes the manager's ledger lock (or another lock held
+        # across I/O) runs on a thread: a full resync holds it for seconds.
+        ledger, refresh = await asyncio.to_thread(self.manager._cache_status, force_refresh)
+        if refresh == "now":
+            ledger = await self._refresh_ledger(full=force_refresh)
+        elif refresh == "background":
+            # Serve what we have and revalidate off the request path.
+            self._start_background_refresh()
+        return ledger
+
+    async def _refresh_ledger(self, full=False):
+        return await self._single_flight(("ledger", full), lambda: self._read_ledger(full))
+
+    async def _read_ledger(self, full=False):
+        plan = await asyncio.to_thread(self.manager._plan_refresh, full)
+        if plan["tail_range"]:
+            result = await self._get_values(plan["tail_range"])
+            ledger = await asyncio.to_thread(self.manager._apply_tail_read, plan, result.get('values', []))
+            if ledger is not None:
+                return ledger
+
+        shards = self.manager._shard_ranges((await self._get_sheet_properties()).get("Transactions", {}).get("rowCount", 0))
+        results = await asyncio.gather(*(self._get_values(shard) for shard in shards))
+        shard_values = [result.get('values', []) for result in results]
+        # Parsing the rows and updating the indexes, rollups and SQLite mirror is
+        # CPU work done under the manager's ledger lock, so it runs on a thread.
+        if len(shards) == 1:
+            return await asyncio.to_thread(self.manager._apply_full_read, plan, shard_values[0])
+        return await asyncio.to_thread(
+            lambda: self.manager._apply_full_read(plan, self.manager._merge_shards(shard_values)))
+
+    def _start_background_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self._refresh_ledger()
+        except Exception as e:
+            print(f"[WARN] Background ledger refresh failed: {e}")
+
+    async def find_matching_transactions(self, **criteria):
+        try:
+            await self._ensure_ledger()
+            return {"status": "success", "matches": await asyncio.to_thread(self.manager._match_transactions, criteria)}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def search_transactions(self, date=None, description=None, amount=None, transaction_type=None, category=None):
+        try:
+            await self._ensure_ledger()
+            matches = await asyncio.to_thread(self.manager._search_transactions, date, description, amount, transaction_type, category)
+            return {"status": "success", "matches": matches}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def summarize_transactions(self, group_by="category", start_date=None, end_date=None, transaction_type=None, category=None):
+        try:
+            await self._ensure_ledger()
+            totals = await asyncio.to_thread(self.manager._summarize_transactions, group_by, start_date, end_date, transaction_type, category)
+            return {"status": "success", "group_by": group_by, "totals": totals}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure dates are YYYY-MM-DD."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def query(self, start_date=None, end_date=None, category=None, transaction_type=None, description=None,
+                    amount=None, limit=None):
+        try:
+            await self._ensure_ledger()
+            transactions = await asyncio.to_thread(
+                self.manager._query_transactions, start_date, end_date, category, transaction_type, description, amount, limit)
+            return {"status": "success", "transactions": transactions}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure dates are YYYY-MM-DD."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def _get_sheet_properties(self):
+        sheet_properties = self.manager._sheet_properties
+        if sheet_properties is None:
+            spreadsheet_metadata = await self._request("GET", "", params={"fields": SHEET_PROPERTIES_FIELDS})
+            sheet_properties = await asyncio.to_thread(self.manager._store_sheet_properties, spreadsheet_metadata)
+        return sheet_properties
+
+    async def _get_sheet_id_by_name(self, sheet_name):
+        properties = (await self._get_sheet_properties()).get(sheet_name)
+        if properties is None:
+            return None
+        return properties['sheetId']
+
+    async def edit_transaction(self, row_index=None, date=None, description=None, amount=None, transaction_type=None, category=None,
+                               transaction_id=None):
+        if self.manager.journal is not None:
+            return await asyncio.to_thread(self.manager.edit_transaction, row_index, date, description, amount, transaction_type, category,
+                                           transaction_id)
+        result = await self.get_all_transactions()
+        if result["status"] != "success":
+            return "Failed to retrieve transactions."
+        transactions = result["transactions"]
+
+        if transaction_id is not None:
+            print(f"[INFO] Editing by transaction_id: {transaction_id}")
+            original = await asyncio.to_thread(self.manager._cached_transaction, transaction_id)
+            if original is None:
+                return f"Transaction {transaction_id} not found."
+        elif row_index is not None:
+            print(f"[INFO] Editing by row_index: {row_index}")
+            original = next((txn for txn in transactions if txn["_row_index"] == row_index), None)
+            if original is None:
+                return f"Row index {row_index} is out of range."
+        else:
+            criteria = {
+                "date": date,
+                "description": description,
+                "amount": amount,
+                "transaction_type": transaction_type,
+                "category": category,
+            }
+            original = await asyncio.to_thread(self.manager._find_edit_target, transactions, criteria)
+            if original is None:
+                print("[WARN] No matching transaction found.")
+                return "No matching transaction found."
+
+        row_index = original["_row_index"]
+        try:
+            changes = self.manager._changed_fields(original, date, description, amount, transaction_type, category)
+            if not changes:
+                return f"Transaction at row {row_index} already has those values."
+            await self._update_transaction_cells([(row_index, changes)])
+            return f"Transaction at row {row_index} updated in place."
+        except ValueError as ve:
+            return f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."
+        except httpx.HTTPError as err:
+            return f"Google Sheets API error: {err}"
+
+    async def edit_transactions(self, edits):
+        if self.manager.journal is not None:
+            return await asyncio.to_thread(self.manager.edit_transactions, edits)
+        try:
+            result = await self.get_all_transactions()
+            if result["status"] != "success":
+                return result
+
+            pending, error = await asyncio.to_thread(self.manager._plan_edits, result["transactions"], edits)
+            if error:
+                return error
+            await self._update_transaction_cells(pending)
+            return {"status": "success", "message": f"{len(pending)} transactions updated in place."}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def _update_transaction_cells(self, edits):
+        data = self.manager._transaction_cell_data(edits)
+        if not data:
+            return
+        if len(data) == 1:
+            await self._request(
+                "PUT", f"/values/{quote(data[0]['range'], safe='')}",
+                params={"valueInputOption": "USER_ENTERED"}, json={"values": data[0]['values']})
+        else:
+            await self._request(
+                "POST", "/values:batchUpdate",
+                json={"valueInputOption": "USER_ENTERED", "data": data})
+
+        await asyncio.to_thread(self._cache_updates, edits)
+
+    def _cache_updates(self, edits):
+        for row_index, changes in edits:
+            self.manager._cache_update(row_index, changes)
+
+    async def get_all_existing_categories(self):
+        try:
+            return {"status": "success", "categories": list(await self._get_budget_limits())}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def has_category(self, category):
+        try:
+            budgets = await self._get_budget_limits()
+            if self.manager._category_known(category):
+                return {"status": "success", "exists": True}
+            return {"status": "success", "exists": False, "categories": list(budgets)}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def _get_budget_limits(self):
+        budgets = self.manager._cached_budgets()
+        if budgets is None:
+            # SQLite calls wait on the mirror's writer, so they run on a thread.
+            db = self.manager.db
+            budgets = await asyncio.to_thread(db.get_budgets) if db is not None else None
+            if budgets is None:
+                result = await self._get_values("Budgets!A:B")
+                budgets = self.manager._parse_budgets(result.get('values', []))
+                if db is not None:
+                    await asyncio.to_thread(db.replace_budgets, list(budgets.items()))
+            budgets = await asyncio.to_thread(self.manager._store_budgets, budgets)
+        return budgets
+
+    async def budget_status(self, category=None, month=None):
+        try:
+            await self._ensure_ledger()
+            limits = await self._get_budget_limits()
+            return await asyncio.to_thread(self.manager._budget_status, limits, category, month)
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure month is YYYY-MM."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def delete_transaction(self, row_index: int = None, transaction_id: str = None):
+        if transaction_id is not None:
+            try:
+                await self._ensure_ledger()
+            except httpx.HTTPError as err:
+                return {"status": "error", "message": f"Google Sheets API error: {err}"}
+            txn = await asyncio.to_thread(self.manager._cached_transaction, transaction_id)
+            if txn is None:
+                return {"status": "error", "message": f"Transaction {transaction_id} not found."}
+            row_index = txn["_row_index"]
+        if row_index is None:
+            return {"status": "error", "message": "Give a row_index or a transaction_id to delete."}
+
+        result = await self.delete_transactions([row_index])
+        if result["status"] == "success":
+            result["message"] = f"Transaction at row {row_index} deleted."
+        return result
+
+    async def delete_transactions_by_id(self, transaction_ids):
+        try:
+            await self._ensure_ledger()
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        row_indices, missing = await asyncio.to_thread(self.manager._rows_for_transaction_ids, transaction_ids)
+        if missing:
+            return {"status": "error", "message": f"Transaction {missing[0]} not found; nothing was deleted."}
+        return await self.delete_transactions(row_indices)
+
+    async def delete_transactions(self, row_indices):
+        if self.manager.journal is not None:
+            return await asyncio.to_thread(self.manager.delete_transactions, row_indices)
+        try:
+            row_indices = sorted(set(row_indices))
+            error = self.manager._check_delete_rows(row_indices)
+            if error:
+                return error
+
+            sheet_id = await self._get_sheet_id_by_name("Transactions")
+            requests = self.manager._delete_dimension_requests(sheet_id, row_indices)
+            await self._request("POST", ":batchUpdate", json={'requests': requests})
+            await asyncio.to_thread(self.manager._apply_deleted_rows, row_indices)
+
+            return {"status": "success", "message": f"{len(row_indices)} transactions deleted.", "deleted_rows": row_indices}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    async def modify_budget(self, category: str, budget_limit: float):
+        if self.manager.journal is not None:
+            return await asyncio.to_thread(self.manager.modify_budget, category, budget_limit)
+        try:
+            # Fetch all budget limits to find the row index or if it's a new category
+            result = await self._get_values("Budgets!A:B")
+            budget_row_index = self.manager._find_budget_row(result.get('values', []), category)
+
+            budget_limit = float(budget_limit) # Ensure limit is float
+
+            if budget_row_index != -1:
+                # Update existing budget
+                update_range = f"Budgets!B{budget_row_index}"
+                await self._request(
+                    "PUT", f"/values/{quote(update_range, safe='')}",
+                    params={"valueInputOption": "USER_ENTERED"}, json={'values': [[budget_limit]]})
+                await asyncio.to_thread(self.manager._budget_saved, category, budget_limit)
+                return {"status": "success", "message": f"Budget for {category} updated to {budget_limit:.2f}."}
+            else:
+                # Add new budget
+                await self._request(
+                    "POST", f"/values/{quote('Budgets!A:B', safe='')}:append",
+                    params={"valueInputOption": "USER_ENTERED"}, json={'values': [[category, budget_limit]]})
+                await asyncio.to_thread(self.manager._budget_saved, category, budget_limit)
+                return {"status": "success", "message": f"Budget for {category} added with limit {budget_limit:.2f}."}
+
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure budget limit is a number."}
+        except httpx.HTTPError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
@@ -1,29 +1,597 @@
+import asyncio
+import bisect
+import json
 import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv() # load from .env file
 
 from datetime import datetime
 
+import google_auth_httplib2
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from db_driver import BudgetDatabase
+from ledger_index import INDEXED_FIELDS, DescriptionIndex, TransactionIndex
+from ledger_rollups import BudgetRollups
+from sheets_gateway import GatedHttpRequest, gateway_for
+from write_journal import WriteJournal
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
-class BudgetSheetsManager:
+TRANSACTIONS_HEADER = ['Date', 'Description', 'Amount', 'Type', 'Category']
+TRANSACTION_FIELDS = ('date', 'description', 'amount', 'transaction_type', 'category')
+TRANSACTION_COLUMNS = "ABCDE"
+# Each row carries a stable id in a hidden column F, so it can be found after rows above it move.
+TRANSACTION_ID_HEADER = 'ID'
+TRANSACTION_ID_COLUMN = "F"
+TRANSACTION_COLUMNS_WITH_ID = 6
+
+# Seconds a cached ledger is served before it is revalidated in the background.
+DEFAULT_CACHE_TTL = 60.0
+
+# Only the sheet properties the manager uses; the full spreadsheet resource is large.
+SHEET_PROPERTIES_FIELDS = "sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))"
+
+# Incremental syncs only fetch rows past the last one seen; a full read is still
+# forced this often to pick up edits made to older rows outside this manager.
+DEFAULT_FULL_SYNC_INTERVAL = 900.0
+DEFAULT_CATEGORY_CACHE_TTL = 300.0
+DEFAULT_PAGE_SIZE = 5000
+DEFAULT_SHARD_ROWS = 10000
+DEFAULT_READ_WORKERS = 8
+# Journal replay: rows per append, and the backoff while the sheet is unreachable.
+JOURNAL_BATCH_ROWS = 500
+JOURNAL_RETRY_DELAY = 2.0
+JOURNAL_MAX_RETRY_DELAY = 60.0
+# estimated_ledger_bytes() measures this many rows; the indexes and rollups
+# built over the ledger take about four times the memory of the rows themselves.
+LEDGER_SIZE_SAMPLE = 200
+LEDGER_INDEX_OVERHEAD = 5
+# Fuzzy description matches scoring within this much of the best one are kept.
+DESCRIPTION_SCORE_MARGIN = 0.1
+# Tries at building the description index off the ledger lock before building it under the lock.
+DESCRIPTION_INDEX_BUILD_ATTEMPTS = 3
+
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+
+def _sheets_discovery_document():
+    """Returns the Sheets v4 discovery document bundled with googleapiclient.
+
+    It is read from the package's static copy, never fetched over the network,
+    and parsed once per process so every later manager builds its service in
+    well under a millisecond.
+    """
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            from googleapiclient import discovery_cache
+            _discovery_document = json.loads(discovery_cache.get_static_doc("sheets", "v4"))
+    return _discovery_document
+
+
+def _parse_updated_range(updated_range):
+    """Returns the first and last sheet row of an A1 range like 'Transactions!A7:E9'."""
+    match = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$", updated_range or "")
+    if not match:
+        return None, None
+    first_row = int(match.group(1))
+    last_row = int(match.group(2) or first_row)
+    return first_row, last_row
+
+
+def _row_key(row):
+    """Normalizes a Transactions row so cached and freshly read copies compare equal."""
+    padded = [str(value).strip() for value in row] + ["" for _ in range(5 - len(row))]
+    try:
+        padded[2] = float(padded[2])
+    except ValueError:
+        pass
+    return tuple(padded[:5])
+
+
+def new_transaction_id():
+    # The letter prefix keeps USER_ENTERED from reading an all-digit (or digits
+    # and one "e") hex string as a number and changing the stored id.
+    return f"t{uuid.uuid4().hex}"
+
+
+def _transaction_row_key(txn):
+    return _row_key([txn['date'], txn['description'], txn['amount'], txn['transaction_type'], txn['category']])
+
+
+def _merge_row_ranges(row_indices):
+    """Groups sheet rows into (first, last) runs of adjacent rows, bottom of the sheet first."""
+    runs = []
+    for row in sorted(set(row_indices), reverse=True):
+        if runs and runs[-1][0] == row + 1:
+            runs[-1][0] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
+class ThreadLocalHttp:
+    """Gives every thread its own authorized httplib2.Http for the Sheets service.
+
+    httplib2.Http is not thread-safe, so a service built on one shared instance
+    breaks as soon as calls arrive from asyncio.to_thread or a thread pool.
+    Passing build_request as the service's requestBuilder makes each request use
+    the calling thread's connection, which stays open between calls so TLS
+    sessions are reused per thread. Once a gateway is set, every request is
+    paced and retried by it; managers sharing one pool across spreadsheets
+    pass their own gateway to request_for() instead.
+    """
+
+    def __init__(self, creds, timeout=60, gateway=None):
+        self.creds = creds
+        self.timeout = timeout
+        self.gateway = gateway
+        self._local = threading.local()
+
+    def get(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http(timeout=self.timeout))
+            self._local.http = http
+        return http
+
+    def build_request(self, http, *args, **kwargs):
+        return self.request_for(self.gateway, *args, **kwargs)
+
+    def request_for(self, gateway, *args, **kwargs):
+        # googleapiclient hands us the service-wide http; swap in this thread's.
+        if gateway is not None:
+            return GatedHttpRequest(gateway, self.get(), *args, **kwargs)
+        return HttpRequest(self.get(), *args, **kwargs)
+
+
+class AppendBatcher:
+    """Coalesces Transactions rows submitted close together into one values().append.
+
+    A batch is written once it holds max_rows rows or the first row in it has
+    waited max_delay seconds. Each submit() gets a Future resolving to the sheet
+    row its row landed on, or raising the error the batch failed with.
+    """
+
+    def __init__(self, append_rows, max_rows=100, max_delay=0.25):
+        self.append_rows = append_rows
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending = []
+        self._flush_requested = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("AppendBatcher is closed")
+            self._pending.append((row, future))
+            self._condition.notify()
+        return future
+
+    def flush(self):
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.max_delay
+                while (len(self._pending) < self.max_rows
+                       and not self._flush_requested and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_rows]
+                del self._pending[:self.max_rows]
+                if not self._pending:
+                    self._flush_requested = False
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            row_indices = self.append_rows([row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), row_index in zip(batch, row_indices):
+            future.set_result(row_index)
+
+
+def _merge_budget(budgets, category, budget_limit):
+    # An existing row keeps the spelling it has in the sheet.
+    key = category.strip().lower()
+    name = next((name for name in budgets if name.lower() == key), category.strip())
+    budgets[name] = budget_limit
+
+
+class SingleFlight:
+    """Lets concurrent callers asking for the same key share one in-flight call.
+
+    The first caller runs the call; anyone asking for the same key before it
+    finishes waits for it and gets its result (or its exception). `shared`
+    counts the calls that were saved this way.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    async def ado(self, key, make_coroutine):
+        """Async do(): shares calls with every other caller of this SingleFlight.
+
+        The leader's coroutine runs as a task on its own event loop; everyone,
+        sync or async and on whichever loop, waits on the same Future.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if leader:
+            def publish(task):
+                self._finish(key)
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+            asyncio.ensure_future(make_coroutine()).add_done_callback(publish)
+        # shield() keeps one cancelled caller from cancelling the call for the rest.
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _finish(self, key):
+        # Dropped before the result is published, so later callers start a fresh call.
+        with self._lock:
+            del self._calls[key]
+
+
+class _ColumnsCache:
+    """Ledger observer holding the current TransactionColumns, patched on single writes.
+
+    A reset drops it, and the next search rebuilds it outside the ledger lock.
+    Patches swap in a new TransactionColumns rather than changing the held one.
+    """
+
+    def __init__(self):
+        self.columns = None
+
+    def ledger_reset(self, transactions):
+        self.columns = None
+
+    def ledger_appended(self, transactions):
+        if self.columns is None:
+            return
+        if len(self.columns) and transactions[0]['_row_index'] <= self.columns.row_index[-1]:
+            self.columns = None
+        else:
+            self.columns = self.columns.appended(transactions)
+
+    def ledger_updated(self, old, new):
+        if self.columns is not None:
+            self.columns = self.columns.updated(new)
+
+    def ledger_deleted(self, deleted, row_indices):
+        if self.columns is not None:
+            self.columns = self.columns.deleted(row_indices)
+
+
+class _DescriptionsCache:
+    """Ledger observer holding the trigram DescriptionIndex, patched in place on writes.
+
+    Like _ColumnsCache, a reset drops it; building one over a large ledger
+    takes seconds, so it is rebuilt outside the ledger lock (see
+    BudgetSheetsManager._build_description_index).
+    """
+
     def __init__(self):
-        self.creds = self._get_credentials()
-        self.service = build("sheets", "v4", credentials=self.creds)
-        self.spreadsheet_id = os.getenv("GOOGLE_SPREADSHEET_ID") or self._get_spreadsheet_id()
+        self.index = None
+
+    def ledger_reset(self, transactions):
+        self.index = None
+
+    def ledger_appended(self, transactions):
+        if self.index is not None:
+            self.index.ledger_appended(transactions)
+
+    def ledger_updated(self, old, new):
+        if self.index is not None:
+            self.index.ledger_updated(old, new)
+
+    def ledger_deleted(self, deleted, row_indices):
+        if self.index is not None:
+            self.index.ledger_deleted(deleted, row_indices)
+
+
+class BudgetSheetsManager:
+    def __init__(self, cache_ttl=None, incremental_sync=True, full_sync_interval=None,
+                 batch_writes=False, batch_max_rows=100, batch_max_delay=0.25, db_path=None,
+                 category_cache_ttl=None, shard_rows=None, read_workers=DEFAULT_READ_WORKERS,
+                 journal_path=None, spreadsheet_id=None, creds=None, http_pool=None):
+        started = time.perf_counter()
+        self.startup_timings = {}
+        # ManagerPool passes in credentials and an http pool shared by all its managers.
+        self.creds = creds or self._get_credentials()
+        self.startup_timings["credentials"] = time.perf_counter() - started
+        self.http_pool = http_pool or ThreadLocalHttp(self.creds)
+        self.gateway = None
+
+        # The googleapiclient service is built on first use (see the service
+        # property), so creating a manager costs no discovery work at all.
+        self._service = None
+        self._service_lock = threading.Lock()
+        # Identical reads already in flight are shared instead of sent again.
+        self._single_flight = SingleFlight()
+
+        # Spreadsheet metadata cache: sheet title -> sheetId and grid size, plus each
+        # sheet's header row. Filled on first use and only dropped when this
+        # manager adds a sheet.
+        self._sheet_properties = None
+        self._sheet_headers = None
+        self._metadata_lock = threading.RLock()
+
+        if spreadsheet_id:
+            self.spreadsheet_id = spreadsheet_id
+            self._ensure_budgets_sheet()
+        else:
+            self.spreadsheet_id = os.getenv("GOOGLE_SPREADSHEET_ID") or self._get_spreadsheet_id()
         print(self.spreadsheet_id)
 
         if not self.spreadsheet_id:
             raise ValueError("GOOGLE_SPREADSHEET_ID is not set in environment")
 
-    def _get_credentials(self):
+        # Every Sheets call is rate limited and retried through the spreadsheet's
+        # shared gateway, paced against its OAuth user's quota (the refresh token
+        # tells users apart); gateway.stats() has the throttle/retry counters.
+        self.gateway = gateway_for(self.spreadsheet_id, getattr(self.creds, "refresh_token", None))
+
+        # Write-through ledger cache. Local writes patch it in place; once it is
+        # older than cache_ttl it is still served while a background refresh runs.
+        # A cache_ttl of 0 disables caching and reads the sheet every time.
+        if cache_ttl is None:
+            cache_ttl = os.getenv("BUDGET_CACHE_TTL", DEFAULT_CACHE_TTL)
+        self.cache_ttl = float(cache_ttl)
+        self._ledger = None
+        self._ledger_fetched_at = 0.0
+        self._ledger_version = 0
+        self._ledger_lock = threading.RLock()
+        self._ledger_observers = []
+        self._refresh_thread = None
+        self._columns = _ColumnsCache()
+
+        # Category/type/date hash indexes, kept current by every cache change.
+        self._index = TransactionIndex()
+        self.add_ledger_observer(self._index)
+        # Trigram index for fuzzy description search; rebuilt off the lock after a reset.
+        self._descriptions = _DescriptionsCache()
+        self.add_ledger_observer(self._descriptions)
+        # Per (category, month, type) totals for budget_status.
+        self._rollups = BudgetRollups()
+        self.add_ledger_observer(self._rollups)
+        # NumPy columns for searches and summaries; built on first use, then patched.
+        self.add_ledger_observer(self._columns)
+
+        # Incremental sync state: how many sheet rows the cache covers and the
+        # normalized contents of the last one, used as an anchor on tail reads.
+        if full_sync_interval is None:
+            full_sync_interval = os.getenv("BUDGET_FULL_SYNC_INTERVAL", DEFAULT_FULL_SYNC_INTERVAL)
+        self.incremental_sync = incremental_sync
+        self.full_sync_interval = float(full_sync_interval)
+        self._ledger_row_count = 0
+        self._ledger_tail_key = None
+        self._ledger_full_sync_at = 0.0
+
+        # Full reads of sheets longer than shard_rows are split into row ranges
+        # fetched concurrently (BUDGET_SHARD_ROWS; 0 always reads in one request).
+        if shard_rows is None:
+            shard_rows = os.getenv("BUDGET_SHARD_ROWS", DEFAULT_SHARD_ROWS)
+        self.shard_rows = int(shard_rows)
+        self.read_workers = read_workers
+        # One pool for the life of the manager: ThreadLocalHttp keeps a connection
+        # per thread, so fresh threads per read would reconnect for every shard.
+        self._read_pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="ledger-read")
+
+        # Budgets tab cache (category -> limit) plus a lowercase set of the names,
+        # so validating a category needs no read. modify_budget patches it in place.
+        if category_cache_ttl is None:
+            category_cache_ttl = os.getenv("BUDGET_CATEGORY_CACHE_TTL", DEFAULT_CATEGORY_CACHE_TTL)
+        self.category_cache_ttl = float(category_cache_ttl)
+        self._budgets = None
+        self._category_keys = frozenset()
+        self._budgets_fetched_at = 0.0
+        self._budgets_lock = threading.Lock()
+
+        # Opt-in write coalescing: add_transaction calls that arrive within
+        # batch_max_delay of each other share a single values().append.
+        self._append_batcher = None
+        if batch_writes:
+            self._append_batcher = AppendBatcher(self._append_transaction_rows, batch_max_rows, batch_max_delay)
+
+        # Optional SQLite mirror (BUDGET_DB_PATH). A restarted process serves the
+        # mirrored ledger straight away and reconciles it with the sheet in the
+        # background; start_background_sync() keeps it reconciled from then on.
+        if db_path is None:
+            db_path = os.getenv("BUDGET_DB_PATH")
+        self.db = None
+        self._sync_thread = None
+        self._sync_stop = threading.Event()
+        if db_path:
+            self.db = BudgetDatabase(db_path)
+            self._load_ledger_from_db()
+            # The mirror already holds the ledger it just loaded; don't rewrite it.
+            self.add_ledger_observer(self.db, replay=False)
+
+        # Optional write-ahead journal (BUDGET_JOURNAL_PATH). Mutations are fsynced
+        # there and acknowledged straight away; a replay thread writes them to the
+        # sheet in order, retrying until it is reachable, including after a restart.
+        if journal_path is None:
+            journal_path = os.getenv("BUDGET_JOURNAL_PATH")
+        self.journal = None
+        self._replay_thread = None
+        self._replay_wake = threading.Event()
+        if journal_path:
+            self.journal = WriteJournal(journal_path)
+            self._replay_thread = threading.Thread(target=self._replay_loop, daemon=True)
+            self._replay_thread.start()
+
+        self.startup_timings["init"] = time.perf_counter() - started
+        print(f"[TIMING] BudgetSheetsManager ready in {self.startup_timings['init'] * 1000:.1f} ms "
+              f"(credentials {self.startup_timings['credentials'] * 1000:.1f} ms)")
+
+    @property
+    def service(self):
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    started = time.perf_counter()
+                    self._service = self._build_service()
+                    self.startup_timings["service"] = time.perf_counter() - started
+                    print(f"[TIMING] Sheets service built in {self.startup_timings['service'] * 1000:.1f} ms")
+        return self._service
+
+    def _build_service(self):
+        from googleapiclient.discovery import build_from_document
+        return build_from_document(
+            _sheets_discovery_document(), http=self.http_pool.get(), requestBuilder=self._build_request)
+
+    def _build_request(self, http, *args, **kwargs):
+        # The http pool may serve other spreadsheets too, so the gateway is this manager's.
+        return self.http_pool.request_for(self.gateway, *args, **kwargs)
+
+    def _get_values(self, a1_range):
+        return self._single_flight.do(("values", a1_range), lambda: self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id, range=a1_range).execute())
+
+    def close(self):
+        if self._append_batcher is not None:
+            self._append_batcher.close()
+            self._append_batcher = None
+        self._sync_stop.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join()
+            self._sync_thread = None
+        if self._replay_thread is not None:
+            self._replay_wake.set()
+            self._replay_thread.join()
+            self._replay_thread = None
+            self.journal.close()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        self._read_pool.shutdown(wait=False)
+
+    def estimated_ledger_bytes(self):
+        """Rough memory held by the cached ledger, its indexes and rollups."""
+        with self._ledger_lock:
+            ledger = self._ledger or []
+            if not ledger:
+                return 0
+            step = max(1, len(ledger) // LEDGER_SIZE_SAMPLE)
+            sample = ledger[::step]
+            row_bytes = sum(sys.getsizeof(txn) + sum(sys.getsizeof(value) for value in txn.values())
+                            for txn in sample) / len(sample)
+            return int(row_bytes * LEDGER_INDEX_OVERHEAD * len(ledger))
+
+    def _load_ledger_from_db(self):
+        mirrored = self.db.load_ledger()
+        if mirrored is None:
+            return
+        transactions, row_count, tail_key = mirrored
+        full_sync = self.db.get_state("ledger_full_sync")
+        full_sync_age = time.time() - full_sync["synced_at"] if full_sync else float("inf")
+        with self._ledger_lock:
+            # Left stale on purpose: the first read is answered from the mirror
+            # while a refresh runs in the background. That is a tail read from the
+            # mirrored row count unless the last full read is older than
+            # full_sync_interval.
+            self._ledger = transactions
+            self._ledger_row_count = row_count
+            self._ledger_tail_key = tail_key
+            self._ledger_fetched_at = 0.0
+            self._ledger_full_sync_at = time.monotonic() - max(0.0, full_sync_age)
+            self._notify("ledger_reset", transactions)
+        print(f"[INFO] Loaded {len(transactions)} transactions from {self.db.path}.")
+
+    def start_background_sync(self, interval=None):
+        """Periodically reconciles the ledger cache (and SQLite mirror) with the sheet."""
+        if interval is None:
+            interval = self.cache_ttl or DEFAULT_CACHE_TTL
+        if self._sync_thread is not None:
+            return
+        self._sync_stop.clear()
+        self._sync_thread = threading.Thread(target=self._sync_loop, args=(interval,), daemon=True)
+        self._sync_thread.start()
+
+    def _sync_loop(self, interval):
+        while not self._sync_stop.wait(interval):
+            try:
+                self._refresh_ledger()
+                # Rebuilt here after a full resync, so the next search doesn't wait for it.
+                self._build_description_index()
+                if self.db is not None:
+                    self._sync_budgets()
+            except Exception as e:
+                print(f"[WARN] Background sync failed: {e}")
+
+    @staticmethod
+    def _get_credentials():
         creds = None
         script_dir = os.path.dirname(os.path.abspath(__file__))
         token_path = os.path.join(script_dir, "token.json")
@@ -33,6 +601,8 @@ class BudgetSheetsManager:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
             else:
+                # Only needed for the interactive first-run flow; importing it is slow.
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 credentials_path = os.path.join(script_dir, "credentials.json")
                 flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
                 creds = flow.run_local_server(port=0)
@@ -61,14 +631,17 @@ class BudgetSheetsManager:
                 f.write(spreadsheet_id)
             
             # Add header row to the main sheet (now named Transactions)
-            header_values = [["Date", "Description", "Amount", "Type", "Category"]]
+            header_values = [["Date", "Description", "Amount", "Type", "Category", TRANSACTION_ID_HEADER]]
             self.service.spreadsheets().values().update(
                 spreadsheetId=spreadsheet_id, range="Transactions!A1",
                 valueInputOption="RAW", body={'values': header_values}).execute()
 
-        # Ensure Budgets sheet exists
-        spreadsheet_metadata = self.service.spreadsheets().get(spreadsheetId=self.spreadsheet_id).execute()
-        sheets = [s.get('properties').get('title') for s in spreadsheet_metadata.get('sheets', '')]
+        self.spreadsheet_id = spreadsheet_id
+        self._ensure_budgets_sheet()
+        return spreadsheet_id
+
+    def _ensure_budgets_sheet(self):
+        sheets = self._get_sheet_properties()
 
         if "Budgets" not in sheets:
             body = {
@@ -81,31 +654,28 @@ class BudgetSheetsManager:
                 }]
             }
             self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body=body).execute()
+            self._invalidate_metadata()
             
             # Add header row to the Budgets sheet
             budget_header_values = [["Category", "Budget Limit"]]
             self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id, range="Budgets!A1",
+                spreadsheetId=self.spreadsheet_id, range="Budgets!A1",
                 valueInputOption="RAW", body={'values': budget_header_values}).execute()
 
-        return spreadsheet_id
-
     def add_transaction(self, date: str, description: str, amount: float, transaction_type: str, category: str = ""):
         try:
-            # Validate date format
-            datetime.strptime(date, "%Y-%m-%d")
-            
-            # Ensure amount is a float
-            amount = float(amount)
+            row = self._transaction_row(date, description, amount, transaction_type, category)
+            if self.journal is not None:
+                journal_id = self.journal.append("add", {"row": row})
+                self._replay_wake.set()
+                return {"status": "success", "message": "Transaction recorded; it will be written to the sheet shortly.",
+                        "journal_id": journal_id, "transaction_id": row[5]}
+            if self._append_batcher is not None:
+                row_index = self._append_batcher.submit(row).result()
+            else:
+                row_index = self._append_transaction_rows([row])[0]
 
-            # Date (A), Description (B), Amount (C), Type (D), Category (E)
-            values = [[date, description, amount, transaction_type, category]]
-            body = {'values': values}
-            result = self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id, range="Transactions!A:E",
-                valueInputOption="USER_ENTERED", body=body).execute()
-            
-            return {"status": "success", "message": f"{result.get('updates').get('updatedCells')} cells updated. Transaction added."}
+            return {"status": "success", "message": f"{len(row)} cells updated. Transaction added.", "row_index": row_index}
         except ValueError as ve:
             return {"status": "error", "message": f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."}
         except HttpError as err:
@@ -118,57 +688,539 @@ class BudgetSheetsManager:
             
 #            return row_index
 
-    def get_all_transactions(self):
+    def _transaction_row(self, date, description, amount, transaction_type, category=""):
+        # Validate date format
+        datetime.strptime(date, "%Y-%m-%d")
+        
+        # Ensure amount is a float
+        amount = float(amount)
+
+        # Date (A), Description (B), Amount (C), Type (D), Category (E), ID (F)
+        return [date, description, amount, transaction_type, category, new_transaction_id()]
+
+    def _append_transaction_rows(self, values):
+        body = {'values': values}
+        result = self.service.spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id, range="Transactions!A:F",
+            valueInputOption="USER_ENTERED", body=body).execute()
+        return self._apply_appended_rows(values, result.get('updates', {}).get('updatedRange'))
+
+    def _apply_appended_rows(self, values, updated_range):
+        # Appended rows are contiguous, so the first row of updatedRange places them all.
+        first_row, last_row = _parse_updated_range(updated_range)
+        if last_row is not None:
+            self._adjust_sheet_row_count("Transactions", row_count=last_row)
+        self._cache_append(first_row, [dict(zip(TRANSACTION_FIELDS, row), id=row[5] if len(row) > 5 else "")
+                                       for row in values])
+        return [first_row + offset if first_row is not None else None for offset in range(len(values))]
+
+    def get_all_transactions(self, force_refresh=False):
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id, range="Transactions!A:E").execute()
+            ledger = self._ensure_ledger(force_refresh)
+            return {"status": "success", "transactions": self._copy_ledger(ledger)}
+
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    def iter_transactions(self, page_size=DEFAULT_PAGE_SIZE):
+        """Yields transactions in sheet order, reading page_size rows per request.
+
+        Pages come straight from the sheet (Transactions!A2:F5001, A5002:F10001,
+        ...) rather than the ledger cache, so a caller that stops early never
+        downloads the rest and only one page is held at a time. Sheets API
+        errors are raised as HttpError.
+        """
+        for page in self._iter_transaction_pages(page_size):
+            yield from page
+
+    def _iter_transaction_pages(self, page_size=DEFAULT_PAGE_SIZE):
+        row_count = self._get_sheet_properties().get("Transactions", {}).get("rowCount", 0)
+        first_row = 2
+        while True:
+            last_row = first_row + page_size - 1
+            result = self._get_values(f"Transactions!A{first_row}:F{last_row}")
             values = result.get('values', [])
-            
-            transactions = []
-            # Skip header row if present
-            start_row = 0
-            if values and values[0] == ['Date', 'Description', 'Amount', 'Type', 'Category']:
-                start_row = 1
-
-            for i, row in enumerate(values[start_row:]):
-                sheet_row_index = i + start_row + 1 
-                padded_row = row + ["" for _ in range(5 - len(row))]
-
-                date = padded_row[0].strip()
-                description = padded_row[1].strip()
-                amount_str = padded_row[2].strip()
-                transaction_type = padded_row[3].strip()
-                category = padded_row[4].strip()
+            transactions = self._parse_transactions(values, first_row_index=first_row)
+            if transactions:
+                yield transactions
+            if self._is_last_page(values, last_row, page_size, row_count):
+                return
+            first_row = last_row + 1
+
+    def _is_last_page(self, values, last_row, page_size, row_count):
+        # Trailing blank rows are trimmed from values, so a short page that reaches
+        # the grid's last known row is the end; a full one may have more after it.
+        return len(values) < page_size and last_row >= row_count
+
+    def _parse_transactions(self, values, first_row_index=1):
+        transactions = []
+        # Skip header row if present
+        start_row = 0
+        if first_row_index == 1 and values and values[0][:5] == TRANSACTIONS_HEADER:
+            start_row = 1
+
+        for i, row in enumerate(values[start_row:]):
+            sheet_row_index = i + start_row + first_row_index 
+            padded_row = row + ["" for _ in range(6 - len(row))]
+
+            date = padded_row[0].strip()
+            description = padded_row[1].strip()
+            amount_str = padded_row[2].strip()
+            transaction_type = padded_row[3].strip()
+            category = padded_row[4].strip()
+            transaction_id = padded_row[5].strip()
 
-                try:
-                    amount = float(amount_str)
-                    transactions.append({
-                        'date': date, 
-                        'description': description, 
-                        'amount': amount, 
-                        'transaction_type': transaction_type, 
-                        'category': category,
-                        '_row_index': sheet_row_index
-                    })
-                except ValueError:
-                    # Skip rows with invalid amounts
-                    pass 
-            return {"status": "success", "transactions": transactions}
+            try:
+                amount = float(amount_str)
+                transactions.append({
+                    'date': date, 
+                    'description': description, 
+                    'amount': amount, 
+                    'transaction_type': transaction_type, 
+                    'category': category,
+                    'id': transaction_id,
+                    '_row_index': sheet_row_index
+                })
+            except ValueError:
+                # Skip rows with invalid amounts
+                pass 
+        return transactions
+
+    def _ensure_ledger(self, force_refresh=False):
+        ledger, refresh = self._cache_status(force_refresh)
+        if refresh == "now":
+            ledger = self._refresh_ledger(full=force_refresh)
+        elif refresh == "background":
+            # Serve what we have and revalidate off the request path.
+            self._start_background_refresh()
+        return ledger
+
+    def _cache_status(self, force_refresh=False):
+        # Returns the cached ledger and whether it has to be refreshed "now",
+        # in the "background", or not at all (None).
+        with self._ledger_lock:
+            ledger = self._ledger
+            age = time.monotonic() - self._ledger_fetched_at
+        if ledger is None or force_refresh or self.cache_ttl <= 0:
+            return ledger, "now"
+        if age > self.cache_ttl:
+            return ledger, "background"
+        return ledger, None
+
+    def _copy_ledger(self, ledger):
+        with self._ledger_lock:
+            return [dict(txn) for txn in ledger]
+
+    def _refresh_ledger(self, full=False):
+        # Concurrent refreshes, foreground or background, share one read.
+        return self._single_flight.do(("ledger", full), lambda: self._read_ledger(full))
+
+    def _read_ledger(self, full=False):
+        plan = self._plan_refresh(full)
+        if plan["tail_range"]:
+            result = self._get_values(plan["tail_range"])
+            ledger = self._apply_tail_read(plan, result.get('values', []))
+            if ledger is not None:
+                return ledger
+
+        shards = self._shard_ranges(self._get_sheet_properties().get("Transactions", {}).get("rowCount", 0))
+        if len(shards) == 1:
+            result = self._get_values("Transactions!A:F")
+            return self._apply_full_read(plan, result.get('values', []))
+
+        def read_shard(shard):
+            return self._get_values(shard).get('values', [])
+
+        shard_values = list(self._read_pool.map(read_shard, shards))
+        return self._apply_full_read(plan, self._merge_shards(shard_values))
+
+    def _shard_ranges(self, row_count):
+        # The last shard is open-ended, so rows appended past a stale rowCount are still read.
+        if self.shard_rows <= 0 or row_count <= self.shard_rows:
+            return ["Transactions!A:F"]
+        shards = [f"Transactions!A{first}:F{first + self.shard_rows - 1}"
+                  for first in range(1, row_count - self.shard_rows + 1, self.shard_rows)]
+        shards.append(f"Transactions!A{len(shards) * self.shard_rows + 1}:F")
+        return shards
+
+    def _merge_shards(self, shard_values):
+        # Each shard comes back with its trailing blank rows trimmed; pad them back
+        # so row positions (and so _row_index) line up across shard boundaries.
+        values = []
+        for values_in_shard in shard_values[:-1]:
+            values.extend(values_in_shard)
+            values.extend([] for _ in range(self.shard_rows - len(values_in_shard)))
+        values.extend(shard_values[-1])
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _plan_refresh(self, full=False):
+        with self._ledger_lock:
+            plan = {
+                "version": self._ledger_version,
+                "row_count": self._ledger_row_count,
+                "tail_key": self._ledger_tail_key,
+                "tail_range": None,
+            }
+            incremental = (
+                self.incremental_sync and not full
+                and self._ledger is not None and self._ledger_tail_key is not None
+                and time.monotonic() - self._ledger_full_sync_at < self.full_sync_interval
+            )
+        if incremental:
+            # Re-read the last row we know about along with anything after it. If it
+            # no longer matches, rows above it were inserted or deleted and only a
+            # full read can tell which.
+            plan["tail_range"] = f"Transactions!A{plan['row_count']}:F"
+        return plan
+
+    def _apply_tail_read(self, plan, values):
+        row_count = plan["row_count"]
+        if not values or _row_key(values[0]) != plan["tail_key"]:
+            print(f"[INFO] Transactions row {row_count} changed since last sync; doing a full read.")
+            return None
+
+        new_transactions = self._parse_transactions(values[1:], first_row_index=row_count + 1)
+        with self._ledger_lock:
+            # A local write landed while we were reading; the sheet snapshot may
+            # predate it, so keep the patched cache and revalidate next time.
+            if self._ledger_version != plan["version"]:
+                return self._ledger
+            self._ledger.extend(new_transactions)
+            self._ledger_row_count = row_count + len(values) - 1
+            self._ledger_tail_key = _row_key(values[-1])
+            self._ledger_fetched_at = time.monotonic()
+            self._ledger_version += 1
+            if new_transactions:
+                self._notify("ledger_appended", new_transactions)
+            self._notify_sync_state()
+            return self._ledger
+
+    def _apply_full_read(self, plan, values):
+        transactions = self._parse_transactions(values)
+        with self._ledger_lock:
+            if self._ledger is not None and self._ledger_version != plan["version"]:
+                return self._ledger
+            self._ledger = transactions
+            self._ledger_row_count = len(values)
+            self._ledger_tail_key = _row_key(values[-1]) if values else None
+            self._ledger_fetched_at = self._ledger_full_sync_at = time.monotonic()
+            self._ledger_version += 1
+            self._notify("ledger_reset", transactions)
+            self._notify_sync_state()
+            return transactions
+
+    def _start_background_refresh(self):
+        with self._ledger_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._background_refresh, daemon=True)
+            self._refresh_thread.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh_ledger()
+        except Exception as e:
+            print(f"[WARN] Background ledger refresh failed: {e}")
+
+    def add_ledger_observer(self, observer, replay=True):
+        """Registers an object to be told about every change to the cached ledger.
+
+        Observers may implement any of ledger_reset(transactions),
+        ledger_appended(transactions), ledger_updated(old, new),
+        ledger_deleted(deleted, row_indices) and ledger_sync_state(row_count,
+        tail_key). They are called under the ledger lock, in the order the
+        changes were applied, and must not modify the transactions they get.
+        If a ledger is already cached, the observer gets a ledger_reset with it
+        straight away, unless replay is False.
+        """
+        with self._ledger_lock:
+            self._ledger_observers.append(observer)
+            if replay and self._ledger is not None and hasattr(observer, "ledger_reset"):
+                observer.ledger_reset(self._ledger)
+
+    def _notify(self, event, *args):
+        for observer in self._ledger_observers:
+            handler = getattr(observer, event, None)
+            if handler is not None:
+                handler(*args)
+
+    def _notify_sync_state(self):
+        self._notify("ledger_sync_state", self._ledger_row_count, self._ledger_tail_key)
+
+    def invalidate_cache(self):
+        with self._ledger_lock:
+            self._ledger = None
+            self._ledger_fetched_at = 0.0
+            self._ledger_row_count = 0
+            self._ledger_tail_key = None
+            self._ledger_version += 1
+            self._columns.columns = None
+            self._descriptions.index = None
+
+    def _cache_append(self, first_row_index, transactions):
+        # One notification per batch, so observers (the NumPy columns especially)
+        # patch once however many rows an append carried.
+        if not transactions:
+            return
+        with self._ledger_lock:
+            if self._ledger is None:
+                return
+            if first_row_index is None:
+                # Can't place the rows without their index; fall back to a full read.
+                self.invalidate_cache()
+                return
+            appended = [dict(txn, _row_index=first_row_index + offset) for offset, txn in enumerate(transactions)]
+            self._ledger.extend(appended)
+            if first_row_index == self._ledger_row_count + 1:
+                self._ledger_row_count = appended[-1]['_row_index']
+                self._ledger_tail_key = _transaction_row_key(appended[-1])
+            else:
+                # Someone else appended in between; the next refresh must re-read.
+                self._ledger_tail_key = None
+                self._ledger_fetched_at = 0.0
+            self._ledger_version += 1
+            self._notify("ledger_appended", appended)
+            self._notify_sync_state()
+
+    def _cache_update(self, row_index, changes):
+        with self._ledger_lock:
+            if self._ledger is None:
+                return
+            txn = self._cached_row(row_index)
+            if txn is not None:
+                old = dict(txn)
+                txn.update(changes)
+                if row_index == self._ledger_row_count:
+                    self._ledger_tail_key = _transaction_row_key(txn)
+                self._ledger_version += 1
+                self._notify("ledger_updated", old, txn)
+
+    def _cached_row(self, row_index):
+        # The ledger is kept in row order, so a binary search finds the row; caller holds _ledger_lock.
+        ledger = self._ledger or []
+        low, high = 0, len(ledger)
+        while low < high:
+            middle = (low + high) // 2
+            if ledger[middle]['_row_index'] < row_index:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(ledger) and ledger[low]['_row_index'] == row_index:
+            return ledger[low]
+        return None
+
+    def _transaction_by_id(self, transaction_id):
+        """Returns a copy of the cached transaction with this id (its current row included), or None."""
+        self._ensure_ledger()
+        return self._cached_transaction(transaction_id)
+
+    def _cached_transaction(self, transaction_id):
+        with self._ledger_lock:
+            txn = self._index.get(transaction_id)
+            return dict(txn) if txn is not None else None
+
+    def _cache_delete(self, row_indices):
+        deleted = sorted(set(row_indices))
+        with self._ledger_lock:
+            if self._ledger is None:
+                return
+            ledger = []
+            removed = []
+            for txn in self._ledger:
+                # Every deleted row above this one shifts it up by one.
+                shift = bisect.bisect_left(deleted, txn['_row_index'])
+                if shift < len(deleted) and deleted[shift] == txn['_row_index']:
+                    removed.append(txn)
+                    continue
+                txn['_row_index'] -= shift
+                ledger.append(txn)
+            self._ledger[:] = ledger
+
+            old_row_count = self._ledger_row_count
+            self._ledger_row_count -= bisect.bisect_right(deleted, old_row_count)
+            if old_row_count in deleted:
+                # The anchor row itself went away; re-anchor on the new last row.
+                previous = [txn for txn in ledger if txn['_row_index'] == self._ledger_row_count]
+                self._ledger_tail_key = _transaction_row_key(previous[0]) if previous else None
+            self._ledger_version += 1
+            self._notify("ledger_deleted", removed, deleted)
+            self._notify_sync_state()
 
+
+
+    def find_matching_transactions(self, **criteria):
+        try:
+            self._ensure_ledger()
+            return {"status": "success", "matches": self._match_transactions(criteria)}
         except HttpError as err:
             return {"status": "error", "message": f"Google Sheets API error: {err}"}
         except Exception as e:
             return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
+    def search_transactions(self, date=None, description=None, amount=None, transaction_type=None, category=None):
+        """Like find_matching_transactions, but description and category match as substrings."""
+        try:
+            self._ensure_ledger()
+            return {"status": "success", "matches": self._search_transactions(date, description, amount, transaction_type, category)}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
+    def summarize_transactions(self, group_by="category", start_date=None, end_date=None, transaction_type=None, category=None):
+        try:
+            self._ensure_ledger()
+            totals = self._summarize_transactions(group_by, start_date, end_date, transaction_type, category)
+            return {"status": "success", "group_by": group_by, "totals": totals}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure dates are YYYY-MM-DD."}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
-    def find_matching_transactions(self, **criteria):
-        all_txns_response = self.get_all_transactions()
-        if all_txns_response["status"] != "success":
-            return {"status": "error", "message": all_txns_response["message"]}
+    def query(self, start_date=None, end_date=None, category=None, transaction_type=None, description=None,
+              amount=None, limit=None):
+        """Transactions dated start_date..end_date (inclusive, YYYY-MM-DD), narrowed by the other filters.
 
-        transactions = all_txns_response["transactions"]
+        Date bounds are looked up in the sorted date index, so only the rows in
+        the window are visited. Description matches as a substring; the other
+        filters match whole values.
+        """
+        try:
+            self._ensure_ledger()
+            transactions = self._query_transactions(start_date, end_date, category, transaction_type, description, amount, limit)
+            return {"status": "success", "transactions": transactions}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure dates are YYYY-MM-DD."}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
+    def _transaction_columns(self):
+        # Single writes patch the cached columns; a full rebuild (after a reset)
+        # happens outside the ledger lock and is kept only if nothing changed meanwhile.
+        from ledger_columns import TransactionColumns
+        with self._ledger_lock:
+            if self._columns.columns is not None:
+                return self._columns.columns
+            version = self._ledger_version
+            transactions = list(self._ledger or [])
+
+        columns = TransactionColumns(transactions)
+        with self._ledger_lock:
+            if self._ledger_version == version and self._ledger is not None:
+                self._columns.columns = columns
+        return columns
+
+    def _search_transactions(self, date=None, description=None, amount=None, transaction_type=None, category=None):
+        columns = self._transaction_columns()
+        mask = columns.mask(date=date, amount=amount, transaction_type=transaction_type, category=category, partial=True)
+        if description is None:
+            return columns.select(mask)
+
+        # Descriptions go through the trigram index, so near-misses match and only the best ones come back.
+        if mask.all():
+            return self._description_matches(description)
+        allowed = set(columns.row_index[mask].tolist())
+        return self._description_matches(description, lambda txn: txn['_row_index'] in allowed)
+
+    def _build_description_index(self):
+        # Built from a snapshot outside the ledger lock and installed only if the
+        # ledger didn't change meanwhile; a few writes landing mid-build just mean
+        # another try.
+        for _ in range(DESCRIPTION_INDEX_BUILD_ATTEMPTS):
+            with self._ledger_lock:
+                if self._descriptions.index is not None or self._ledger is None:
+                    return
+                version = self._ledger_version
+                transactions = list(self._ledger)
+            index = DescriptionIndex()
+            index.ledger_reset(transactions)
+            with self._ledger_lock:
+                if self._ledger_version == version and self._ledger is not None:
+                    self._descriptions.index = index
+                    return
+
+    def _description_matches(self, description, keep=None):
+        # Copies of the kept rows whose description best resembles the query, best first.
+        self._build_description_index()
+        with self._ledger_lock:
+            index = self._descriptions.index
+            if index is None:
+                # The ledger kept changing under every attempt; build it here.
+                index = DescriptionIndex()
+                index.ledger_reset(self._ledger or [])
+                if self._ledger is not None:
+                    self._descriptions.index = index
+            ranked = [(score, txn) for score, txn in index.search(description)
+                      if keep is None or keep(txn)]
+            if not ranked:
+                return []
+            cutoff = ranked[0][0] - DESCRIPTION_SCORE_MARGIN
+            return [dict(txn) for score, txn in ranked if score >= cutoff]
+
+    def _summarize_transactions(self, group_by="category", start_date=None, end_date=None, transaction_type=None, category=None):
+        columns = self._transaction_columns()
+        mask = columns.mask(start_date=start_date, end_date=end_date,
+                            transaction_type=transaction_type, category=category)
+        return columns.totals(group_by, mask)
+
+    def _query_transactions(self, start_date=None, end_date=None, category=None, transaction_type=None,
+                            description=None, amount=None, limit=None):
+        for bound in (start_date, end_date):
+            if bound is not None:
+                datetime.strptime(bound, "%Y-%m-%d")
+
+        with self._ledger_lock:
+            if start_date is not None or end_date is not None:
+                candidates = self._index.date_range(start_date, end_date)
+            else:
+                candidates = self._index.lookup(category=category, transaction_type=transaction_type)
+                if candidates is None:
+                    candidates = self._ledger or []
+
+            criteria = {"category": category, "transaction_type": transaction_type, "amount": amount}
+            needle = description.strip().lower() if description else None
+            results = []
+            for txn in self._filter_transactions(candidates, criteria):
+                if needle is not None and needle not in str(txn['description']).lower():
+                    continue
+                results.append(dict(txn))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def _indexed_candidates(self, criteria):
+        # Copies of the rows matching the indexed criteria, or None if none were given.
+        with self._ledger_lock:
+            candidates = self._index.lookup(**criteria)
+            if candidates is None:
+                return None
+            return [dict(txn) for txn in candidates]
+
+    def _match_transactions(self, criteria):
+        criteria = {key: value for key, value in criteria.items() if value is not None}
+        candidates = self._indexed_candidates(criteria)
+        if candidates is not None:
+            # The indexes settled category/type/date; check the rest on what's left.
+            remaining = {key: value for key, value in criteria.items() if key not in INDEXED_FIELDS}
+            return self._filter_transactions(candidates, remaining)
+
+        column_criteria = {key: criteria.pop(key) for key in TRANSACTION_FIELDS if key in criteria}
+        columns = self._transaction_columns()
+        matches = columns.select(columns.mask(**column_criteria))
+        if criteria:
+            # Anything the columns don't cover (e.g. _row_index) is checked row by row.
+            matches = self._filter_transactions(matches, criteria)
+        return matches
+
+    def _filter_transactions(self, transactions, criteria):
         def matches(txn):
             for key, value in criteria.items():
                 if value is None:
@@ -188,52 +1240,179 @@ class BudgetSheetsManager:
                         return False
             return True
 
-        matches = [txn for txn in transactions if matches(txn)]
-
-        return {"status": "success", "matches": matches}
-
+        return [txn for txn in transactions if matches(txn)]
+
+
+    def _get_sheet_properties(self):
+        with self._metadata_lock:
+            if self._sheet_properties is None:
+                spreadsheet_metadata = self.service.spreadsheets().get(
+                    spreadsheetId=self.spreadsheet_id, fields=SHEET_PROPERTIES_FIELDS).execute()
+                self._store_sheet_properties(spreadsheet_metadata)
+            return self._sheet_properties
+
+    def _store_sheet_properties(self, spreadsheet_metadata):
+        sheet_properties = {}
+        for s in spreadsheet_metadata.get('sheets', []):
+            properties = s.get('properties', {})
+            grid = properties.get('gridProperties', {})
+            sheet_properties[properties.get('title')] = {
+                'sheetId': properties.get('sheetId'),
+                'rowCount': grid.get('rowCount', 0),
+                'columnCount': grid.get('columnCount', 0),
+            }
+        with self._metadata_lock:
+            self._sheet_properties = sheet_properties
+        return sheet_properties
+
+    def get_sheet_header(self, sheet_name):
+        with self._metadata_lock:
+            if self._sheet_headers is None:
+                # One batchGet fills in the header row of every sheet at once.
+                titles = list(self._get_sheet_properties())
+                result = self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=[f"'{title}'!1:1" for title in titles]).execute()
+                value_ranges = result.get('valueRanges', [])
+                self._sheet_headers = {
+                    title: (value_range.get('values') or [[]])[0]
+                    for title, value_range in zip(titles, value_ranges)
+                }
+            return self._sheet_headers.get(sheet_name)
+
+    def _invalidate_metadata(self):
+        with self._metadata_lock:
+            self._sheet_properties = None
+            self._sheet_headers = None
+
+    def _adjust_sheet_row_count(self, sheet_name, row_count=None, delta=0):
+        # Keep the cached grid size in step with our own appends and deletes.
+        with self._metadata_lock:
+            properties = (self._sheet_properties or {}).get(sheet_name)
+            if properties is None:
+                return
+            if row_count is not None:
+                properties['rowCount'] = max(properties['rowCount'], row_count)
+            properties['rowCount'] += delta
 
     def _get_sheet_id_by_name(self, sheet_name):
-        spreadsheet_metadata = self.service.spreadsheets().get(spreadsheetId=self.spreadsheet_id).execute()
-        sheets = spreadsheet_metadata.get('sheets', '')
-        for s in sheets:
-            if s.get('properties').get('title') == sheet_name:
-                return s.get('properties').get('sheetId')
-        return None
-
-
-
+        properties = self._get_sheet_properties().get(sheet_name)
+        if properties is None:
+            return None
+        return properties['sheetId']
+
+    def _rows_still_missing_ids(self, keys):
+        """Of keys ({row index: row key}), the rows whose sheet contents still match and whose F cell is empty."""
+        if not keys:
+            return []
+        runs = _merge_row_ranges(keys)
+        result = self.service.spreadsheets().values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=[f"Transactions!A{first_row}:{TRANSACTION_ID_COLUMN}{last_row}" for first_row, last_row in runs]).execute()
+        rows = []
+        for (first_row, last_row), value_range in zip(runs, result.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            for offset, row_index in enumerate(range(first_row, last_row + 1)):
+                row = values[offset] if offset < len(values) else []
+                if _row_key(row) == keys[row_index] and not (len(row) > 5 and str(row[5]).strip()):
+                    rows.append(row_index)
+        return rows
+
+    def ensure_transaction_ids(self):
+        """Gives every Transactions row that lacks one a stable id, and hides the ID column.
+
+        Sheets created before ids existed have nothing in column F (or no
+        column F at all). This writes an id into each such row and, if the
+        header row lacks it, the ID header into F1, then patches the ledger cache; rows that already have
+        an id are left alone, so running it again only costs a read and the
+        (idempotent) request that keeps column F hidden.
+        """
+        try:
+            ledger = self._ensure_ledger(force_refresh=True)
+            with self._ledger_lock:
+                keys = {txn['_row_index']: _transaction_row_key(txn) for txn in ledger if not txn.get('id')}
+            properties = self._get_sheet_properties().get("Transactions", {})
+            column_count = properties.get("columnCount", 0)
+            requests = []
+            if column_count < TRANSACTION_COLUMNS_WITH_ID:
+                requests.append({'appendDimension': {
+                    'sheetId': properties['sheetId'], 'dimension': 'COLUMNS',
+                    'length': TRANSACTION_COLUMNS_WITH_ID - column_count}})
+            requests.append({'updateDimensionProperties': {
+                'range': {'sheetId': properties['sheetId'], 'dimension': 'COLUMNS',
+                          'startIndex': TRANSACTION_COLUMNS_WITH_ID - 1, 'endIndex': TRANSACTION_COLUMNS_WITH_ID},
+                'properties': {'hiddenByUser': True},
+                'fields': 'hiddenByUser'}})
+            self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': requests}).execute()
+            self._invalidate_metadata()
+
+            # F1 only gets the ID header when row 1 really is the header row.
+            header = self.get_sheet_header("Transactions") or []
+            data = []
+            if header[:5] == TRANSACTIONS_HEADER and header[5:6] != [TRANSACTION_ID_HEADER]:
+                data.append({'range': f"Transactions!{TRANSACTION_ID_COLUMN}1", 'values': [[TRANSACTION_ID_HEADER]]})
+            if not keys and not data:
+                return {"status": "success", "message": "All transactions already have ids.", "assigned": 0}
+
+            # This runs alongside session writes, so rows can have moved since the
+            # ledger read: re-read them just before writing and only fill in an F
+            # cell that is still empty on the row it was meant for. Rows that moved
+            # are picked up by the next run.
+            missing = {row_index: new_transaction_id() for row_index in self._rows_still_missing_ids(keys)}
+            for first_row, last_row in _merge_row_ranges(missing):
+                data.append({
+                    'range': f"Transactions!{TRANSACTION_ID_COLUMN}{first_row}:{TRANSACTION_ID_COLUMN}{last_row}",
+                    'values': [[missing[row]] for row in range(first_row, last_row + 1)],
+                })
+            if data:
+                self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'valueInputOption': "RAW", 'data': data}).execute()
+            with self._metadata_lock:
+                self._sheet_headers = None
+
+            with self._ledger_lock:
+                if self._ledger is not None and missing:
+                    for row_index, transaction_id in missing.items():
+                        txn = self._cached_row(row_index)
+                        if txn is not None and not txn.get('id') and _transaction_row_key(txn) == keys[row_index]:
+                            txn['id'] = transaction_id
+                    # One reset rebuilds the indexes and the SQLite mirror instead of an update per row.
+                    self._ledger_version += 1
+                    self._notify("ledger_reset", self._ledger)
+            print(f"[INFO] Assigned ids to {len(missing)} transactions.")
+            return {"status": "success", "message": f"Assigned ids to {len(missing)} transactions.", "assigned": len(missing)}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
-    def edit_transaction(self, row_index=None, date=None, description=None, amount=None, transaction_type=None, category=None):
-        # If row_index is provided, skip matching logic and go straight to delete + re-add
+    def edit_transaction(self, row_index=None, date=None, description=None, amount=None, transaction_type=None, category=None,
+                         transaction_id=None):
+        # A stable id is looked up in the cache's id map, wherever the row has moved to
+        if transaction_id is not None:
+            print(f"[INFO] Editing by transaction_id: {transaction_id}")
+            try:
+                original = self._transaction_by_id(transaction_id)
+            except HttpError as err:
+                return f"Google Sheets API error: {err}"
+            if original is None:
+                return f"Transaction {transaction_id} not found."
+            return self._edit_in_place(original, date, description, amount, transaction_type, category)
+
+        # If row_index is provided, skip matching logic and update that row in place
         if row_index is not None:
             print(f"[INFO] Editing by row_index: {row_index}")
-            try:
-                result = self.get_all_transactions()
-                if result["status"] != "success":
-                    # handle error, e.g.
-                    return "Failed to retrieve transactions."
-
-                transactions = result["transactions"]
-                try:
-                    original = transactions[row_index - 2]  # offset for header row
-                except IndexError:
-                    return f"Row index {row_index} is out of range."
+            result = self.get_all_transactions()
+            if result["status"] != "success":
+                # handle error, e.g.
+                return "Failed to retrieve transactions."
 
-            except IndexError:
+            original = next((txn for txn in result["transactions"] if txn["_row_index"] == row_index), None)
+            if original is None:
                 return f"Row index {row_index} is out of range."
 
-            updated_transaction = {
-                "date": date or original.get("date"),
-                "description": description or original.get("description"),
-                "amount": amount or original.get("amount"),
-                "transaction_type": transaction_type or original.get("transaction_type"),
-                "category": category or original.get("category"),
-            }
-
-            self.delete_transaction(row_index)
-            self.add_transaction(**updated_transaction)
-            return f"Transaction at row {row_index} updated by delete-and-recreate."
+            return self._edit_in_place(original, date, description, amount, transaction_type, category)
 
         # Fallback: find a matching transaction if row_index not provided
         criteria = {
@@ -248,9 +1427,16 @@ class BudgetSheetsManager:
         result = self.get_all_transactions()
         if result["status"] != "success":
             raise Exception(result.get("message", "Failed to get transactions"))
-        transactions = result["transactions"]
 
+        txn = self._find_edit_target(result["transactions"], criteria)
+        if txn is not None:
+            print(f"[INFO] Found match at row {txn['_row_index']}: {txn}")
+            return self._edit_in_place(txn, date, description, amount, transaction_type, category)
 
+        print("[WARN] No matching transaction found.")
+        return "No matching transaction found."
+
+    def _find_edit_target(self, transactions, criteria):
         def matches(txn, criteria):
             for key, value in criteria.items():
                 if value is None:
@@ -264,31 +1450,150 @@ class BudgetSheetsManager:
                             return False
                     except:
                         return False
-                elif key == "description":
-                    if value.lower() not in txn_value.lower():
-                        return False
                 else:
                     if str(txn_value).strip().lower() != str(value).strip().lower():
                         return False
             return True
 
-        for i, txn in enumerate(transactions):
+        if criteria.get("description") is not None:
+            # Take the best fuzzy description match that satisfies everything else.
+            rest = {key: value for key, value in criteria.items() if key != "description"}
+            matches_found = self._description_matches(criteria["description"], lambda txn: matches(txn, rest))
+            return matches_found[0] if matches_found else None
+
+        candidates = self._indexed_candidates(criteria)
+        if candidates is not None:
+            transactions = candidates
+
+        for txn in transactions:
             if matches(txn, criteria):
-                row_index = i + 2
-                print(f"[INFO] Found match at row {row_index}: {txn}")
-                updated_transaction = {
-                    "date": date or txn.get("date"),
-                    "description": description or txn.get("description"),
-                    "amount": amount or txn.get("amount"),
-                    "transaction_type": transaction_type or txn.get("transaction_type"),
-                    "category": category or txn.get("category"),
-                }
-                self.delete_transaction(row_index)
-                self.add_transaction(**updated_transaction)
-                return f"Transaction updated by delete-and-recreate at row {row_index}."
+                return txn
+        return None
 
-        print("[WARN] No matching transaction found.")
-        return "No matching transaction found."
+    def edit_transactions(self, edits):
+        """Applies several edits in one values().batchUpdate.
+
+        Each edit is a dict with a row_index (or transaction_id) and the fields
+        to change, e.g. {"row_index": 5, "amount": 12.5, "category": "Food"}.
+        """
+        try:
+            result = self.get_all_transactions()
+            if result["status"] != "success":
+                return result
+
+            pending, error = self._plan_edits(result["transactions"], edits)
+            if error:
+                return error
+            self._update_transaction_cells(pending)
+            if self.journal is not None:
+                return {"status": "success", "message": f"{len(pending)} transactions updated; queued to be written to the sheet shortly."}
+            return {"status": "success", "message": f"{len(pending)} transactions updated in place."}
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    def _plan_edits(self, transactions, edits):
+        by_row = {txn["_row_index"]: txn for txn in transactions}
+        by_id = {txn["id"]: txn for txn in transactions if txn.get("id")}
+        pending = []
+        for edit in edits:
+            if edit.get("transaction_id") is not None:
+                original = by_id.get(edit["transaction_id"])
+                if original is None:
+                    return None, {"status": "error", "message": f"Transaction {edit['transaction_id']} not found."}
+                row_index = original["_row_index"]
+            else:
+                row_index = edit.get("row_index")
+                original = by_row.get(row_index)
+            if original is None:
+                return None, {"status": "error", "message": f"Row index {row_index} is out of range."}
+            changes = self._changed_fields(original, *(edit.get(field) for field in TRANSACTION_FIELDS))
+            if changes:
+                pending.append((row_index, changes))
+        return pending, None
+
+    def _changed_fields(self, original, date=None, description=None, amount=None, transaction_type=None, category=None):
+        if date:
+            datetime.strptime(date, "%Y-%m-%d")
+        if amount is not None:
+            amount = float(amount)
+
+        updated_transaction = {
+            "date": date or original.get("date"),
+            "description": description or original.get("description"),
+            "amount": amount if amount is not None else original.get("amount"),
+            "transaction_type": transaction_type or original.get("transaction_type"),
+            "category": category or original.get("category"),
+        }
+        return {field: value for field, value in updated_transaction.items() if value != original.get(field)}
+
+    def _edit_in_place(self, original, date=None, description=None, amount=None, transaction_type=None, category=None):
+        row_index = original["_row_index"]
+        try:
+            changes = self._changed_fields(original, date, description, amount, transaction_type, category)
+            if not changes:
+                return f"Transaction at row {row_index} already has those values."
+            self._update_transaction_cells([(row_index, changes)])
+            if self.journal is not None:
+                return f"Transaction at row {row_index} updated; queued to be written to the sheet shortly."
+            return f"Transaction at row {row_index} updated in place."
+        except ValueError as ve:
+            return f"Invalid input: {ve}. Please ensure date is YYYY-MM-DD and amount is a number."
+        except HttpError as err:
+            return f"Google Sheets API error: {err}"
+
+    def _update_transaction_cells(self, edits):
+        if self.journal is not None:
+            with self._ledger_lock:
+                by_row = {txn['_row_index']: txn for txn in self._ledger or []}
+                journaled = [[row_index, changes, list(_transaction_row_key(by_row[row_index])),
+                              by_row[row_index].get('id', '')]
+                             for row_index, changes in edits]
+            self.journal.append("edit", {"edits": journaled})
+            # Searches see the edit straight away; replay still sends it (see _replay_edits).
+            for row_index, changes in edits:
+                self._cache_update(row_index, changes)
+            self._replay_wake.set()
+            return
+        self._send_transaction_cells(edits)
+
+    def _send_transaction_cells(self, edits):
+        data = self._transaction_cell_data(edits)
+        if not data:
+            return
+        if len(data) == 1:
+            self.service.spreadsheets().values().update(
+                spreadsheetId=self.spreadsheet_id, range=data[0]['range'],
+                valueInputOption="USER_ENTERED", body={'values': data[0]['values']}).execute()
+        else:
+            self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': "USER_ENTERED", 'data': data}).execute()
+
+        for row_index, changes in edits:
+            self._cache_update(row_index, changes)
+
+    def _transaction_cell_data(self, edits):
+        # Only the changed cells are written; adjacent changed columns share a range.
+        data = []
+        for row_index, changes in edits:
+            columns = sorted(TRANSACTION_FIELDS.index(field) for field in changes)
+            runs = []
+            for column in columns:
+                if runs and runs[-1][-1] == column - 1:
+                    runs[-1].append(column)
+                else:
+                    runs.append([column])
+            for run in runs:
+                first, last = TRANSACTION_COLUMNS[run[0]], TRANSACTION_COLUMNS[run[-1]]
+                data.append({
+                    'range': f"Transactions!{first}{row_index}:{last}{row_index}",
+                    'values': [[changes[TRANSACTION_FIELDS[column]] for column in run]],
+                })
+        return data
 
 
 
@@ -338,17 +1643,8 @@ class BudgetSheetsManager:
 
 
     def get_all_existing_categories(self):
-        categories = set()
         try:
-            # Get categories from Budgets sheet column A
-            budgets_result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id, range="Budgets!A:A").execute()
-            budgets_values = budgets_result.get('values', [])
-            for row in budgets_values[1:]:  # skip header row
-                if row and row[0]:
-                    categories.add(row[0].strip())
-
-            return {"status": "success", "categories": list(categories)}
+            return {"status": "success", "categories": list(self._get_budget_limits())}
         except HttpError as err:
             return {"status": "error", "message": f"Google Sheets API error: {err}"}
         except Exception as e:
@@ -356,65 +1652,245 @@ class BudgetSheetsManager:
 
 
 
-    def delete_transaction(self, row_index: int):
+    def budget_status(self, category=None, month=None):
+        """Budget limit, spending and what's left per category for a month ("YYYY-MM", default this month)."""
         try:
-            if row_index <= 1: # Prevent deleting header row
-                return {"status": "error", "message": "Cannot delete header row or invalid row index."}
-
-            requests = [{
-                'deleteDimension': {
-                    'range': {
-                        'sheetId': self._get_sheet_id_by_name("Transactions"),
-                        'dimension': 'ROWS',
-                        'startIndex': row_index - 1, # Sheets API is 0-indexed for startIndex
-                        'endIndex': row_index
-                    }
-                }
-            }]
-            self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': requests}).execute()
-            
-            return {"status": "success", "message": f"Transaction at row {row_index} deleted."}
+            self._ensure_ledger()
+            return self._budget_status(self._get_budget_limits(), category, month)
+        except ValueError as ve:
+            return {"status": "error", "message": f"Invalid input: {ve}. Please ensure month is YYYY-MM."}
         except HttpError as err:
             return {"status": "error", "message": f"Google Sheets API error: {err}"}
         except Exception as e:
             return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
-    def modify_budget(self, category: str, budget_limit: float):
+    def has_category(self, category):
+        """Checks category against the Budgets tab names, case-insensitively, using the category cache."""
         try:
-            # Fetch all budget limits to find the row index or if it's a new category
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id, range="Budgets!A:B").execute()
-            values = result.get('values', [])
-            
-            budget_row_index = -1
-            # Skip header row if present
-            start_row = 0
-            if values and values[0] == ['Category', 'Budget Limit']:
-                start_row = 1
-
-            for i, row in enumerate(values[start_row:]):
-                if len(row) >= 1 and row[0].strip().lower() == category.lower():
-                    budget_row_index = i + start_row + 1 # 1-indexed row in sheet
-                    break
-            
-            budget_limit = float(budget_limit) # Ensure limit is float
+            budgets = self._get_budget_limits()
+            if self._category_known(category):
+                return {"status": "success", "exists": True}
+            return {"status": "success", "exists": False, "categories": list(budgets)}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
-            if budget_row_index != -1:
-                # Update existing budget
-                update_range = f"Budgets!B{budget_row_index}"
-                body = {'values': [[budget_limit]]}
-                self.service.spreadsheets().values().update(
-                    spreadsheetId=self.spreadsheet_id, range=update_range,
-                    valueInputOption="USER_ENTERED", body=body).execute()
-                return {"status": "success", "message": f"Budget for {category} updated to {budget_limit:.2f}."}
+    def _category_known(self, category):
+        with self._budgets_lock:
+            return category.strip().lower() in self._category_keys
+
+    def _get_budget_limits(self, force_refresh=False):
+        budgets = self._cached_budgets(force_refresh)
+        if budgets is None:
+            if self.db is not None:
+                # The mirror is kept current by the background sync.
+                budgets = self.db.get_budgets()
+                if budgets is None:
+                    budgets = self._sync_budgets()
             else:
-                # Add new budget
-                values = [[category, budget_limit]]
-                body = {'values': values}
-                self.service.spreadsheets().values().append(
-                    spreadsheetId=self.spreadsheet_id, range="Budgets!A:B",
-                    valueInputOption="USER_ENTERED", body=body).execute()
-                return {"status": "success", "message": f"Budget for {category} added with limit {budget_limit:.2f}."}
+                result = self._get_values("Budgets!A:B")
+                budgets = self._parse_budgets(result.get('values', []))
+            budgets = self._store_budgets(budgets)
+        return budgets
+
+    def _cached_budgets(self, force_refresh=False):
+        # A copy of the cached {category: limit}, or None once it is missing or older than category_cache_ttl.
+        with self._budgets_lock:
+            if self._budgets is None or force_refresh:
+                return None
+            if time.monotonic() - self._budgets_fetched_at > self.category_cache_ttl:
+                return None
+            return dict(self._budgets)
+
+    def _store_budgets(self, budgets):
+        budgets = dict(budgets)
+        if self.journal is not None:
+            # Budgets still waiting in the journal aren't on the sheet yet.
+            for entry in self.journal.pending():
+                if entry["op"] == "modify_budget":
+                    _merge_budget(budgets, entry["args"]["category"], entry["args"]["budget_limit"])
+        with self._budgets_lock:
+            self._budgets = dict(budgets)
+            self._category_keys = frozenset(category.lower() for category in budgets)
+            self._budgets_fetched_at = time.monotonic()
+        return budgets
+
+    def invalidate_category_cache(self):
+        with self._budgets_lock:
+            self._budgets = None
+            self._category_keys = frozenset()
+
+    def _budget_status(self, limits, category=None, month=None):
+        if month is None:
+            month = datetime.now().strftime("%Y-%m")
+        else:
+            month = datetime.strptime(month, "%Y-%m").strftime("%Y-%m")
+
+        with self._ledger_lock:
+            totals = self._rollups.totals(month, category)
+            names = {key: self._rollups.category_name(key) for key in totals}
+        limits = {name.lower(): (name, budget_limit) for name, budget_limit in limits.items()}
+        for key, (name, budget_limit) in limits.items():
+            names[key] = name
+
+        keys = set(totals) | set(limits)
+        if category is not None:
+            keys &= {category.strip().lower()}
+
+        categories = []
+        for key in sorted(keys):
+            by_type = totals.get(key, {})
+            budget_limit = limits.get(key, (None, None))[1]
+            spent = by_type.get("expense", 0.0)
+            categories.append({
+                "category": names.get(key, category),
+                "budget_limit": budget_limit,
+                "spent": spent,
+                "income": by_type.get("income", 0.0),
+                "remaining": round(budget_limit - spent, 2) if budget_limit is not None else None,
+            })
+        return {"status": "success", "month": month, "categories": categories}
+
+    def _sync_budgets(self):
+        result = self._get_values("Budgets!A:B")
+        budgets = self._parse_budgets(result.get('values', []))
+        self.db.replace_budgets(list(budgets.items()))
+        return self._store_budgets(budgets)
+
+    def _parse_budgets(self, values):
+        budgets = {}
+        for row in values[1:]:  # skip header row
+            if row and row[0].strip():
+                try:
+                    budget_limit = float(row[1]) if len(row) > 1 else None
+                except ValueError:
+                    budget_limit = None
+                budgets[row[0].strip()] = budget_limit
+        return budgets
+
+    def delete_transaction(self, row_index: int = None, transaction_id: str = None):
+        if transaction_id is not None:
+            try:
+                txn = self._transaction_by_id(transaction_id)
+            except HttpError as err:
+                return {"status": "error", "message": f"Google Sheets API error: {err}"}
+            if txn is None:
+                return {"status": "error", "message": f"Transaction {transaction_id} not found."}
+            row_index = txn["_row_index"]
+        if row_index is None:
+            return {"status": "error", "message": "Give a row_index or a transaction_id to delete."}
+
+        result = self.delete_transactions([row_index])
+        if result["status"] == "success":
+            result["message"] = f"Transaction at row {row_index} deleted."
+        return result
+
+    def delete_transactions_by_id(self, transaction_ids):
+        """Deletes exactly the transactions with these ids, wherever they are now; nothing is deleted if any is missing."""
+        try:
+            self._ensure_ledger()
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        row_indices, missing = self._rows_for_transaction_ids(transaction_ids)
+        if missing:
+            return {"status": "error", "message": f"Transaction {missing[0]} not found; nothing was deleted."}
+        return self.delete_transactions(row_indices)
+
+    def _rows_for_transaction_ids(self, transaction_ids):
+        # Returns (row indices, ids not in the cache).
+        with self._ledger_lock:
+            found = {transaction_id: self._index.get(transaction_id) for transaction_id in transaction_ids}
+        row_indices = [txn['_row_index'] for txn in found.values() if txn is not None]
+        return row_indices, [transaction_id for transaction_id, txn in found.items() if txn is None]
+
+    def delete_transactions(self, row_indices):
+        try:
+            row_indices = sorted(set(row_indices))
+            error = self._check_delete_rows(row_indices)
+            if error:
+                return error
+
+            if self.journal is not None:
+                # The journal records each row's contents and id, so replay can find it if it moves.
+                self._ensure_ledger()
+                with self._ledger_lock:
+                    rows = [self._cached_row(row_index) for row_index in row_indices]
+                    missing = [row_index for row_index, txn in zip(row_indices, rows) if txn is None]
+                    journaled = [[txn['_row_index'], list(_transaction_row_key(txn)), txn.get('id', '')]
+                                 for txn in rows if txn is not None]
+                if missing:
+                    return {"status": "error", "message": f"Row {missing[0]} not found."}
+                self.journal.append("delete", {"rows": journaled})
+                self._replay_wake.set()
+                return {"status": "success", "message": f"{len(row_indices)} transactions queued for deletion.", "deleted_rows": row_indices}
+
+            self._send_delete(row_indices)
+            return {"status": "success", "message": f"{len(row_indices)} transactions deleted.", "deleted_rows": row_indices}
+        except HttpError as err:
+            return {"status": "error", "message": f"Google Sheets API error: {err}"}
+        except Exception as e:
+            return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+    def _send_delete(self, row_indices):
+        requests = self._delete_dimension_requests(self._get_sheet_id_by_name("Transactions"), row_indices)
+        self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': requests}).execute()
+        self._apply_deleted_rows(row_indices)
+
+    def _check_delete_rows(self, row_indices):
+        if not row_indices:
+            return {"status": "error", "message": "No rows to delete."}
+        if row_indices[0] <= 1: # Prevent deleting header row
+            return {"status": "error", "message": "Cannot delete header row or invalid row index."}
+        return None
+
+    def _delete_dimension_requests(self, sheet_id, row_indices):
+        # Runs are ordered bottom-up so each deleteDimension leaves the row
+        # numbers of the ones after it untouched.
+        return [{
+            'deleteDimension': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'dimension': 'ROWS',
+                    'startIndex': first_row - 1, # Sheets API is 0-indexed for startIndex
+                    'endIndex': last_row
+                }
+            }
+        } for first_row, last_row in _merge_row_ranges(row_indices)]
+
+    def _apply_deleted_rows(self, row_indices):
+        self._adjust_sheet_row_count("Transactions", delta=-len(row_indices))
+        self._cache_delete(row_indices)
+
+    def _budget_saved(self, category, budget_limit):
+        if self.db is not None:
+            self.db.upsert_budget(category, budget_limit)
+        with self._budgets_lock:
+            if self._budgets is not None:
+                _merge_budget(self._budgets, category, budget_limit)
+                self._category_keys = self._category_keys | {category.strip().lower()}
+
+    def _find_budget_row(self, values, category):
+        # Skip header row if present
+        start_row = 0
+        if values and values[0] == ['Category', 'Budget Limit']:
+            start_row = 1
+
+        for i, row in enumerate(values[start_row:]):
+            if len(row) >= 1 and row[0].strip().lower() == category.lower():
+                return i + start_row + 1 # 1-indexed row in sheet
+        return -1
+
+    def modify_budget(self, category: str, budget_limit: float):
+        try:
+            budget_limit = float(budget_limit) # Ensure limit is float
+            if self.journal is not None:
+                self.journal.append("modify_budget", {"category": category, "budget_limit": budget_limit})
+                # So has_category() knows a new category before replay writes it.
+                self._budget_saved(category, budget_limit)
+                self._replay_wake.set()
+                return {"status": "success", "message": f"Budget for {category} set to {budget_limit:.2f}; it will be written to the sheet shortly."}
+            return {"status": "success", "message": self._write_budget(category, budget_limit)}
 
         except ValueError as ve:
             return {"status": "error", "message": f"Invalid input: {ve}. Please ensure budget limit is a number."}
@@ -423,6 +1899,176 @@ class BudgetSheetsManager:
         except Exception as e:
             return {"status": "error", "message": f"An unexpected error occurred: {e}"}
 
+    def _write_budget(self, category, budget_limit):
+        # Fetch all budget limits to find the row index or if it's a new category
+        result = self._get_values("Budgets!A:B")
+        budget_row_index = self._find_budget_row(result.get('values', []), category)
+
+        if budget_row_index != -1:
+            # Update existing budget
+            update_range = f"Budgets!B{budget_row_index}"
+            body = {'values': [[budget_limit]]}
+            self.service.spreadsheets().values().update(
+                spreadsheetId=self.spreadsheet_id, range=update_range,
+                valueInputOption="USER_ENTERED", body=body).execute()
+            self._budget_saved(category, budget_limit)
+            return f"Budget for {category} updated to {budget_limit:.2f}."
+        else:
+            # Add new budget
+            values = [[category, budget_limit]]
+            body = {'values': values}
+            self.service.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id, range="Budgets!A:B",
+                valueInputOption="USER_ENTERED", body=body).execute()
+            self._budget_saved(category, budget_limit)
+            return f"Budget for {category} added with limit {budget_limit:.2f}."
+
+    # Write-ahead journal replay
+
+    def _replay_loop(self):
+        delay = JOURNAL_RETRY_DELAY
+        while not self._sync_stop.is_set():
+            self._replay_wake.clear()
+            try:
+                self._replay_journal()
+                delay = JOURNAL_RETRY_DELAY
+                self._replay_wake.wait()
+            except Exception as e:
+                print(f"[WARN] Journal replay stalled, retrying in {delay:.0f}s: {e}")
+                # New writes don't cut the backoff short; they'll go out with the retry.
+                self._sync_stop.wait(delay)
+                delay = min(delay * 2, JOURNAL_MAX_RETRY_DELAY)
+
+    def _replay_journal(self):
+        entries = self.journal.pending()
+        i = 0
+        while i < len(entries) and not self._sync_stop.is_set():
+            if entries[i]["op"] == "add":
+                # Consecutive adds go out as one append, still in journal order.
+                end = i + 1
+                while end < len(entries) and entries[end]["op"] == "add" and end - i < JOURNAL_BATCH_ROWS:
+                    end += 1
+                self._replay_adds(entries[i:end])
+                i = end
+            else:
+                self._replay_entry(entries[i])
+                i += 1
+
+    def _is_permanent_error(self, error):
+        # Bad input or a 4xx other than 429 won't get better by retrying.
+        if isinstance(error, HttpError):
+            return 400 <= error.resp.status < 500 and error.resp.status != 429
+        return isinstance(error, (ValueError, KeyError))
+
+    def _replay_adds(self, entries):
+        ledger = self._ensure_ledger()
+        if any(entry["state"] == "sending" for entry in entries):
+            # Some of these were sent before a failure or restart; re-read to see whether they landed.
+            ledger = self._refresh_ledger(full=True)
+        with self._ledger_lock:
+            counts = Counter(_transaction_row_key(txn) for txn in ledger)
+
+        to_send = []
+        sending = Counter()
+        for entry in entries:
+            row = entry["args"]["row"]
+            key = _row_key(row)
+            if entry["state"] == "sending" and len(row) > 5 and row[5]:
+                # The row carries its own id, so whether it landed is an exact lookup.
+                with self._ledger_lock:
+                    landed = self._index.get(row[5]) is not None
+                if landed:
+                    self.journal.mark(entry["id"], "done")
+                    continue
+            elif entry["state"] == "sending" and counts[key] > entry["before"]:
+                self.journal.mark(entry["id"], "done")
+                continue
+            # "before" is how many rows like this the sheet has without this one.
+            self.journal.mark(entry["id"], "sending", before=counts[key] + sending[key])
+            sending[key] += 1
+            to_send.append(entry)
+        if not to_send:
+            return
+
+        try:
+            self._append_transaction_rows([entry["args"]["row"] for entry in to_send])
+        except Exception as e:
+            if not self._is_permanent_error(e):
+                raise
+            for entry in to_send:
+                print(f"[WARN] Dropping journaled add {entry['id']}: {e}")
+                self.journal.mark(entry["id"], "failed", error=str(e))
+            return
+        for entry in to_send:
+            self.journal.mark(entry["id"], "done")
+
+    def _replay_entry(self, entry):
+        op, args = entry["op"], entry["args"]
+        in_doubt = entry["state"] == "sending"
+        self.journal.mark(entry["id"], "sending")
+        try:
+            if op == "edit":
+                self._replay_edits(args["edits"], in_doubt)
+            elif op == "delete":
+                self._replay_delete(args["rows"])
+            elif op == "modify_budget":
+                self._write_budget(args["category"], args["budget_limit"])
+            else:
+                raise ValueError(f"unknown journal op {op!r}")
+        except Exception as e:
+            if not self._is_permanent_error(e):
+                raise
+            print(f"[WARN] Dropping journaled {op} {entry['id']}: {e}")
+            self.journal.mark(entry["id"], "failed", error=str(e))
+            return
+        self.journal.mark(entry["id"], "done")
+
+    def _locate_journaled_row(self, row_index, key, transaction_id=""):
+        # Rows can move between journaling and replay (an earlier journaled delete,
+        # or edits made elsewhere): follow the row's id if it has one, otherwise
+        # fall back to the row's contents if unique.
+        with self._ledger_lock:
+            if transaction_id:
+                txn = self._index.get(transaction_id)
+                return txn['_row_index'] if txn is not None and _transaction_row_key(txn) == key else None
+            ledger = self._ledger or []
+            txn = self._cached_row(row_index)
+            if txn is not None and _transaction_row_key(txn) == key:
+                return row_index
+            matches = [txn['_row_index'] for txn in ledger if _transaction_row_key(txn) == key]
+        return matches[0] if len(matches) == 1 else None
+
+    def _replay_edits(self, edits, in_doubt=False):
+        # The cache already shows journaled edits, so a row with the edited values
+        # only proves the edit reached the sheet when the ledger was just re-read.
+        if in_doubt:
+            self._refresh_ledger(full=True)
+        else:
+            self._ensure_ledger()
+        resolved = []
+        for row_index, changes, original_key, *rest in edits:
+            original_key = tuple(original_key)
+            transaction_id = rest[0] if rest else ""
+            edited_key = _transaction_row_key(dict(zip(TRANSACTION_FIELDS, original_key), **changes))
+            located = self._locate_journaled_row(row_index, original_key, transaction_id)
+            if located is None:
+                located = self._locate_journaled_row(row_index, edited_key, transaction_id)
+                if located is not None and in_doubt:
+                    continue  # already applied before a restart
+            if located is None:
+                raise ValueError(f"row {row_index} changed before the journaled edit was applied")
+            resolved.append((located, changes))
+        if resolved:
+            self._send_transaction_cells(resolved)
+
+    def _replay_delete(self, rows):
+        self._ensure_ledger()
+        # Rows that can no longer be found are taken as already deleted.
+        located = [self._locate_journaled_row(row_index, tuple(key), *rest) for row_index, key, *rest in rows]
+        row_indices = sorted(set(row for row in located if row is not None))
+        if row_indices:
+            self._send_delete(row_indices)
+
 # Example usage (for testing purposes, remove or guard in production)
 if __name__ == "__main__":
     manager = BudgetSheetsManager()
@@ -0,0 +1,207 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    row_index INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    transaction_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    transaction_id TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_row_index ON transactions (row_index);
+
+CREATE TABLE IF NOT EXISTS budgets (
+    category TEXT PRIMARY KEY COLLATE NOCASE,
+    budget_limit REAL
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+TRANSACTION_COLUMNS = "date, description, amount, transaction_type, category, row_index, transaction_id"
+
+
+class BudgetDatabase:
+    """Local SQLite mirror of the Transactions and Budgets tabs.
+
+    The spreadsheet stays the system of record. BudgetSheetsManager registers
+    this as a ledger observer, so every change to its ledger cache (full reads,
+    tail syncs, local adds/edits/deletes) is mirrored here, and a restarted
+    process can serve the ledger from disk before it has talked to Google and
+    pick up with tail reads where it left off.
+
+    Queries are not run against these tables: the manager loads the mirror
+    into its ledger cache at startup and answers reads from the in-memory
+    indexes built over it, so the only secondary index is the one the
+    row_index updates need.
+
+    The observer hooks run under the manager's ledger lock, so they only
+    snapshot the rows and queue the SQL; a writer thread applies the queue in
+    order. flush() waits for it to drain.
+    """
+
+    def __init__(self, path="budget.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            self._migrate()
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _migrate(self):
+        # Databases mirrored before transactions had stable ids lack the column.
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+        if 'transaction_id' not in columns:
+            self.conn.execute("ALTER TABLE transactions ADD COLUMN transaction_id TEXT NOT NULL DEFAULT ''")
+        # Nothing queries by these columns (see the class docstring); they only slowed down writes.
+        for index in ("idx_transactions_date", "idx_transactions_category", "idx_transactions_description",
+                      "idx_transactions_transaction_id"):
+            self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def close(self):
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            self.conn.close()
+
+    def flush(self):
+        """Waits until every queued ledger change has been written."""
+        self._writes.join()
+
+    def _write_loop(self):
+        while True:
+            write = self._writes.get()
+            try:
+                if write is None:
+                    return
+                with self._lock, self.conn:
+                    write()
+            except Exception as e:
+                print(f"[WARN] SQLite mirror write failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    # Ledger observer hooks, called by BudgetSheetsManager under its ledger lock.
+
+    def ledger_reset(self, transactions):
+        rows = self._rows(transactions)
+        # A reset is a full read of the sheet; a restart uses this to decide whether it is due another.
+        synced = json.dumps({"synced_at": time.time()})
+
+        def write():
+            self.conn.execute("DELETE FROM transactions")
+            self._insert(rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", ("ledger_full_sync", synced))
+        self._writes.put(write)
+
+    def ledger_appended(self, transactions):
+        rows = self._rows(transactions)
+        self._writes.put(lambda: self._insert(rows))
+
+    def ledger_updated(self, old, new):
+        values = (new['date'], new['description'], new['amount'], new['transaction_type'], new['category'],
+                  new.get('id', ''), new['_row_index'])
+        self._writes.put(lambda: self.conn.execute(
+            "UPDATE transactions SET date = ?, description = ?, amount = ?, transaction_type = ?, category = ?, "
+            "transaction_id = ? WHERE row_index = ?", values))
+
+    def ledger_deleted(self, deleted, row_indices):
+        row_indices = sorted(row_indices, reverse=True)
+
+        def write():
+            # Bottom-up, so each shift only touches rows below the one removed.
+            for row_index in row_indices:
+                self.conn.execute("DELETE FROM transactions WHERE row_index = ?", (row_index,))
+                self.conn.execute("UPDATE transactions SET row_index = row_index - 1 WHERE row_index > ?", (row_index,))
+        self._writes.put(write)
+
+    def ledger_sync_state(self, row_count, tail_key):
+        value = json.dumps({"row_count": row_count, "tail_key": tail_key})
+        self._writes.put(lambda: self.conn.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", ("ledger", value)))
+
+    def _rows(self, transactions):
+        # Copied now: the manager renumbers and edits the live dicts after the hook returns.
+        return [(txn['date'], txn['description'], txn['amount'], txn['transaction_type'], txn['category'],
+                 txn['_row_index'], txn.get('id', '')) for txn in transactions]
+
+    def _insert(self, rows):
+        self.conn.executemany(
+            f"INSERT INTO transactions ({TRANSACTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def load_ledger(self):
+        """Returns (transactions, row_count, tail_key), or None if nothing has been mirrored yet."""
+        self.flush()
+        state = self.get_state("ledger")
+        if state is None:
+            return None
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY row_index").fetchall()
+        tail_key = tuple(state["tail_key"]) if state["tail_key"] is not None else None
+        return [self._to_transaction(row) for row in rows], state["row_count"], tail_key
+
+    def _to_transaction(self, row):
+        return {
+            'date': row['date'],
+            'description': row['description'],
+            'amount': row['amount'],
+            'transaction_type': row['transaction_type'],
+            'category': row['category'],
+            'id': row['transaction_id'],
+            '_row_index': row['row_index'],
+        }
+
+    # Budgets
+
+    def replace_budgets(self, budgets):
+        """budgets is a list of (category, budget_limit) pairs read from the Budgets tab."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM budgets")
+            self.conn.executemany("INSERT OR REPLACE INTO budgets (category, budget_limit) VALUES (?, ?)", budgets)
+        self.set_state("budgets", {"synced_at": time.time()})
+
+    def upsert_budget(self, category, budget_limit):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO budgets (category, budget_limit) VALUES (?, ?) "
+                "ON CONFLICT(category) DO UPDATE SET budget_limit = excluded.budget_limit",
+                (category, budget_limit))
+
+    def get_budgets(self):
+        """Returns {category: budget_limit}, or None if the Budgets tab has never been mirrored."""
+        if self.get_state("budgets") is None:
+            return None
+        with self._lock:
+            rows = self.conn.execute("SELECT category, budget_limit FROM budgets ORDER BY category").fetchall()
+        return {row['category']: row['budget_limit'] for row in rows}
+
+    # Sync bookkeeping
+
+    def get_state(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row['value']) if row else None
+
+    def set_state(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
@@ -0,0 +1,92 @@
+import argparse
+import csv
+import os
+import time
+
+from googleapiclient.errors import HttpError
+
+from budget_tools import DEFAULT_PAGE_SIZE, TRANSACTION_ID_HEADER, TRANSACTIONS_HEADER, BudgetSheetsManager
+
+PARQUET_COLUMNS = ("date", "description", "amount", "transaction_type", "category", "id", "row_index")
+
+
+def _write_csv(chunks, handle):
+    writer = csv.writer(handle)
+    writer.writerow(TRANSACTIONS_HEADER + [TRANSACTION_ID_HEADER])
+    count = 0
+    for transactions in chunks:
+        writer.writerows(
+            [txn['date'], txn['description'], txn['amount'], txn['transaction_type'], txn['category'], txn['id']]
+            for txn in transactions)
+        count += len(transactions)
+    return count
+
+
+def _write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("date", pa.string()),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+        ("transaction_type", pa.string()),
+        ("category", pa.string()),
+        ("id", pa.string()),
+        ("row_index", pa.int64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for transactions in chunks:
+            columns = {name: [txn['_row_index' if name == "row_index" else name] for txn in transactions]
+                       for name in PARQUET_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(transactions)
+    return count
+
+
+def export_transactions(manager, path, file_format=None, chunk_rows=DEFAULT_PAGE_SIZE):
+    """Streams the Transactions sheet to a CSV or Parquet file, one page of chunk_rows rows at a time."""
+    started = time.perf_counter()
+    if file_format is None:
+        file_format = "parquet" if os.path.splitext(path)[1].lower() in (".parquet", ".pq") else "csv"
+    if file_format not in ("csv", "parquet"):
+        return {"status": "error", "message": f"Unsupported format {file_format!r}. Use csv or parquet."}
+
+    try:
+        chunks = manager._iter_transaction_pages(chunk_rows)
+        if file_format == "parquet":
+            count = _write_parquet(chunks, path)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as handle:
+                count = _write_csv(chunks, handle)
+
+        print(f"[TIMING] Exported {count} transactions in {time.perf_counter() - started:.2f} s")
+        return {"status": "success", "message": f"{count} transactions exported to {path}.", "exported": count}
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": f"Could not export to {path}: {e}"}
+    except HttpError as err:
+        return {"status": "error", "message": f"Google Sheets API error: {err}"}
+    except Exception as e:
+        return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the budget sheet's transactions to CSV or Parquet.")
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="output format (default: from the extension)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_PAGE_SIZE, help="sheet rows per read request")
+    args = parser.parse_args()
+
+    manager = BudgetSheetsManager()
+    result = export_transactions(manager, args.path, args.format, args.chunk_rows)
+    print(f"[INFO] {result['message']}")
+    manager.close()
+    return 0 if result["status"] == "success" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
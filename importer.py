@@ -0,0 +1,241 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+from googleapiclient.errors import HttpError
+
+# Rows per values().append, and a cap on the JSON size of one request so a
+# chunk of long descriptions stays well under the Sheets payload limit.
+DEFAULT_CHUNK_ROWS = 1000
+MAX_CHUNK_BYTES = 1_000_000
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d", "%d %b %Y", "%b %d, %Y")
+
+# Bank exports name their columns differently; the first match (case-insensitive) wins.
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "trans. date"),
+    "description": ("description", "payee", "name", "memo", "details", "merchant"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "withdrawal", "withdrawals"),
+    "credit": ("credit", "deposit", "deposits"),
+    "transaction_type": ("type", "transaction type"),
+    "category": ("category",),
+}
+
+EXPENSE_TYPES = ("debit", "expense", "withdrawal", "payment", "purchase", "sale", "fee")
+INCOME_TYPES = ("credit", "income", "deposit", "refund", "return")
+
+
+def _parse_date(value):
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized date {value!r}")
+
+
+def _parse_amount(value):
+    value = value.strip().replace("$", "").replace(",", "")
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+    return float(value) if value else 0.0
+
+
+def _transaction_type(amount, type_hint=""):
+    hint = type_hint.strip().lower()
+    if any(word in hint for word in EXPENSE_TYPES):
+        return "Expense"
+    if any(word in hint for word in INCOME_TYPES):
+        return "Income"
+    return "Expense" if amount < 0 else "Income"
+
+
+def _statement_row(date, description, amount, type_hint="", category=""):
+    # Date (A), Description (B), Amount (C), Type (D), Category (E); amounts are stored unsigned.
+    amount = _parse_amount(amount) if isinstance(amount, str) else float(amount)
+    return [_parse_date(date), " ".join(description.split()), abs(amount), _transaction_type(amount, type_hint), category]
+
+
+def iter_csv_rows(path, default_category=""):
+    """Yields (line_number, row or None) for each data line of a bank CSV export; None marks a line that didn't parse."""
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.reader(handle)
+        header = [name.strip().lower() for name in next(reader, [])]
+        columns = {}
+        for field, names in CSV_COLUMNS.items():
+            for name in names:
+                if name in header:
+                    columns[field] = header.index(name)
+                    break
+        if "date" not in columns or "description" not in columns or not (
+                "amount" in columns or "debit" in columns or "credit" in columns):
+            raise ValueError(f"{path}: expected date, description and amount (or debit/credit) columns, got {header}")
+
+        def cell(row, field):
+            index = columns.get(field)
+            return row[index] if index is not None and index < len(row) else ""
+
+        for line_number, row in enumerate(reader, start=2):
+            if not any(value.strip() for value in row):
+                continue
+            try:
+                if "amount" in columns:
+                    amount = _parse_amount(cell(row, "amount"))
+                else:
+                    amount = _parse_amount(cell(row, "credit")) - abs(_parse_amount(cell(row, "debit")))
+                yield line_number, _statement_row(
+                    cell(row, "date"), cell(row, "description"), amount,
+                    cell(row, "transaction_type"), cell(row, "category").strip() or default_category)
+            except ValueError:
+                yield line_number, None
+
+
+def _ofx_tokens(handle, chunk_size=65536):
+    # Splits the file on "<" a chunk at a time, so tags are yielded without loading the whole statement.
+    buffer = ""
+    for chunk in iter(lambda: handle.read(chunk_size), ""):
+        buffer += chunk
+        parts = buffer.split("<")
+        buffer = parts.pop()
+        yield from parts
+    if buffer:
+        yield buffer
+
+
+def iter_ofx_rows(path, default_category=""):
+    """Yields (transaction_number, row or None) for each <STMTTRN> in an OFX/QFX file (SGML or XML)."""
+    number = 0
+    fields = None
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for token in _ofx_tokens(handle):
+            tag, _, text = token.partition(">")
+            tag = tag.strip().upper()
+            if tag == "STMTTRN":
+                fields = {}
+            elif tag == "/STMTTRN" and fields is not None:
+                number += 1
+                try:
+                    posted = re.match(r"\d{8}", fields.get("DTPOSTED", ""))
+                    if posted is None:
+                        raise ValueError("missing DTPOSTED")
+                    date = datetime.strptime(posted.group(0), "%Y%m%d").strftime("%Y-%m-%d")
+                    description = fields.get("NAME") or fields.get("MEMO") or ""
+                    yield number, _statement_row(date, description, fields.get("TRNAMT", ""),
+                                                 "", default_category)
+                except ValueError:
+                    yield number, None
+                fields = None
+            elif fields is not None and not tag.startswith("/"):
+                fields[tag] = text.strip()
+
+
+def _duplicate_key(date, description, amount):
+    return (str(date).strip(), " ".join(str(description).lower().split()), round(float(amount) * 100))
+
+
+def _chunks(rows, chunk_rows, chunk_bytes):
+    chunk, size = [], 0
+    for row in rows:
+        row_size = len(json.dumps(row))
+        if chunk and (len(chunk) >= chunk_rows or size + row_size > chunk_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+def import_statement(manager, path, file_format=None, default_category="", chunk_rows=DEFAULT_CHUNK_ROWS,
+                     dry_run=False):
+    """Streams a CSV or OFX statement into the Transactions sheet.
+
+    Lines matching a row already in the sheet (same date, description and
+    amount) are skipped; each existing row absorbs at most one line, so two
+    identical purchases on the same day still both land. New rows are
+    written in chunks of up to chunk_rows per values().append.
+    """
+    from budget_tools import new_transaction_id
+
+    started = time.perf_counter()
+    if file_format is None:
+        file_format = "ofx" if os.path.splitext(path)[1].lower() in (".ofx", ".qfx") else "csv"
+    if file_format not in ("csv", "ofx"):
+        return {"status": "error", "message": f"Unsupported format {file_format!r}. Use csv or ofx."}
+    parse = iter_ofx_rows if file_format == "ofx" else iter_csv_rows
+
+    try:
+        ledger = manager.get_all_transactions()
+        if ledger["status"] != "success":
+            return ledger
+        existing = Counter(_duplicate_key(txn['date'], txn['description'], txn['amount'])
+                           for txn in ledger["transactions"])
+
+        counts = {"imported": 0, "duplicates": 0, "invalid": 0}
+
+        def new_rows():
+            for line_number, row in parse(path, default_category):
+                if row is None:
+                    counts["invalid"] += 1
+                    print(f"[WARN] {path}: could not parse entry {line_number}, skipping.")
+                    continue
+                key = _duplicate_key(row[0], row[1], row[2])
+                if existing[key] > 0:
+                    existing[key] -= 1
+                    counts["duplicates"] += 1
+                    continue
+                # Same stable id column (F) that add_transaction writes.
+                yield row + [new_transaction_id()]
+
+        for chunk in _chunks(new_rows(), chunk_rows, MAX_CHUNK_BYTES):
+            if not dry_run:
+                manager._append_transaction_rows(chunk)
+            counts["imported"] += len(chunk)
+            print(f"[INFO] {'Parsed' if dry_run else 'Appended'} {counts['imported']} rows from {path}")
+
+        elapsed = time.perf_counter() - started
+        print(f"[TIMING] Imported {path} in {elapsed:.2f} s")
+        verb = "would be imported" if dry_run else "imported"
+        return {
+            "status": "success",
+            "message": f"{counts['imported']} transactions {verb}, {counts['duplicates']} duplicates skipped, "
+                       f"{counts['invalid']} unreadable entries skipped.",
+            **counts,
+        }
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": f"Could not read {path}: {e}"}
+    except HttpError as err:
+        return {"status": "error", "message": f"Google Sheets API error: {err}"}
+    except Exception as e:
+        return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import bank statements (CSV or OFX/QFX) into the budget sheet.")
+    parser.add_argument("paths", nargs="+", help="statement files to import")
+    parser.add_argument("--format", choices=("csv", "ofx"), help="file format (default: from the extension)")
+    parser.add_argument("--category", default="", help="category for rows that don't carry one")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per append request")
+    parser.add_argument("--dry-run", action="store_true", help="parse and dedupe without writing")
+    args = parser.parse_args()
+
+    from budget_tools import BudgetSheetsManager
+    manager = BudgetSheetsManager()
+    failed = False
+    for path in args.paths:
+        result = import_statement(manager, path, args.format, args.category, args.chunk_rows, args.dry_run)
+        print(f"[INFO] {path}: {result['message']}")
+        failed = failed or result["status"] != "success"
+    manager.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+import copy
+
+import numpy as np
+
+COLUMN_ARRAYS = ("row_index", "amount_cents", "date_strings", "dates", "descriptions", "category_codes", "type_codes")
+
+
+class TransactionColumns:
+    """Columnar NumPy view of the ledger for vectorized filtering and totals.
+
+    Dates are datetime64[D] (NaT where the sheet value isn't YYYY-MM-DD),
+    amounts are int64 cents, and category/type are integer codes into a small
+    table of names, compared case-insensitively. Built from the manager's
+    ledger cache; appended(), updated() and deleted() return patched copies
+    for single writes, so a search that already holds this one is never
+    changed under it.
+    """
+
+    def __init__(self, transactions):
+        self.transactions = transactions
+        count = len(transactions)
+
+        self.row_index = np.fromiter((txn['_row_index'] for txn in transactions), dtype=np.int64, count=count)
+        self.amount_cents = np.rint(
+            np.fromiter((txn['amount'] for txn in transactions), dtype=np.float64, count=count) * 100
+        ).astype(np.int64)
+
+        date_strings = [txn['date'].strip() for txn in transactions]
+        self.date_strings = np.array([date.lower() for date in date_strings], dtype=str)
+        self.dates = self._parse_dates(date_strings)
+
+        self.descriptions = np.array([txn['description'].strip().lower() for txn in transactions], dtype=str)
+        self.category_names, self.category_codes = self._encode(txn['category'] for txn in transactions)
+        self.type_names, self.type_codes = self._encode(txn['transaction_type'] for txn in transactions)
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def appended(self, transactions):
+        """A copy with transactions (which must come after every current row) added at the end."""
+        added = TransactionColumns(transactions)
+        columns = copy.copy(self)
+        columns.transactions = self.transactions + list(transactions)
+        for name in ("row_index", "amount_cents", "date_strings", "dates", "descriptions"):
+            setattr(columns, name, np.concatenate([getattr(self, name), getattr(added, name)]))
+        columns.category_names, columns.category_codes = self._merge_codes(
+            self.category_names, self.category_codes, added.category_names, added.category_codes)
+        columns.type_names, columns.type_codes = self._merge_codes(
+            self.type_names, self.type_codes, added.type_names, added.type_codes)
+        return columns
+
+    def updated(self, txn):
+        """A copy with the row of txn (matched on _row_index) replaced, or None if it isn't here."""
+        position = int(np.searchsorted(self.row_index, txn['_row_index']))
+        if position >= len(self) or self.row_index[position] != txn['_row_index']:
+            return None
+        # Appending first widens the string columns and codes the names; then the new row moves into place.
+        extended = self.appended([txn])
+        columns = copy.copy(extended)
+        columns.transactions = list(self.transactions)
+        columns.transactions[position] = txn
+        for name in COLUMN_ARRAYS:
+            values = getattr(extended, name)[:-1].copy()
+            values[position] = getattr(extended, name)[-1]
+            setattr(columns, name, values)
+        return columns
+
+    def deleted(self, row_indices):
+        """A copy without the given sheet rows, later rows renumbered the way the sheet shifts them."""
+        deleted = np.array(sorted(set(row_indices)), dtype=np.int64)
+        keep = ~np.isin(self.row_index, deleted)
+        columns = copy.copy(self)
+        columns.transactions = [self.transactions[i] for i in np.flatnonzero(keep)]
+        for name in COLUMN_ARRAYS:
+            setattr(columns, name, getattr(self, name)[keep])
+        columns.row_index = columns.row_index - np.searchsorted(deleted, columns.row_index)
+        return columns
+
+    def _merge_codes(self, names, codes, other_names, other_codes):
+        lookup = {name.lower(): code for code, name in enumerate(names)}
+        names = list(names)
+        mapping = []
+        for name in other_names:
+            code = lookup.get(name.lower())
+            if code is None:
+                code = lookup[name.lower()] = len(names)
+                names.append(name)
+            mapping.append(code)
+        return names, np.concatenate([codes, np.array(mapping, dtype=np.int64)[other_codes]])
+
+    def _parse_dates(self, date_strings):
+        try:
+            return np.array(date_strings, dtype='datetime64[D]')
+        except ValueError:
+            # At least one cell isn't an ISO date; convert one by one and leave those as NaT.
+            dates = np.full(len(date_strings), np.datetime64('NaT'), dtype='datetime64[D]')
+            for i, date in enumerate(date_strings):
+                try:
+                    dates[i] = np.datetime64(date, 'D')
+                except ValueError:
+                    pass
+            return dates
+
+    def _encode(self, values):
+        # Codes are assigned per lowercased value; the first spelling seen is kept for display.
+        lookup = {}
+        names = []
+        codes = []
+        for value in values:
+            key = value.strip().lower()
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(names)
+                names.append(value.strip())
+            codes.append(code)
+        return names, np.array(codes, dtype=np.int64)
+
+    def _code_mask(self, names, codes, value, partial):
+        needle = str(value).strip().lower()
+        if partial:
+            matching = [code for code, name in enumerate(names) if needle in name.lower()]
+        else:
+            matching = [code for code, name in enumerate(names) if name.lower() == needle]
+        return np.isin(codes, matching)
+
+    def mask(self, date=None, description=None, amount=None, transaction_type=None, category=None,
+             start_date=None, end_date=None, partial=False):
+        """Returns a boolean mask of the rows matching every criterion that isn't None.
+
+        Text compares case-insensitively. With partial=True, description and
+        category match as substrings instead of whole values. Amounts match
+        within a cent.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if date is not None:
+            mask &= self.date_strings == str(date).strip().lower()
+        if start_date is not None:
+            mask &= self.dates >= np.datetime64(start_date, 'D')
+        if end_date is not None:
+            mask &= self.dates <= np.datetime64(end_date, 'D')
+        if description is not None:
+            needle = str(description).strip().lower()
+            if partial:
+                mask &= np.char.find(self.descriptions, needle) >= 0
+            else:
+                mask &= self.descriptions == needle
+        if amount is not None:
+            mask &= np.abs(self.amount_cents - round(float(amount) * 100)) <= 1
+        if transaction_type is not None:
+            mask &= self._code_mask(self.type_names, self.type_codes, transaction_type, partial=False)
+        if category is not None:
+            mask &= self._code_mask(self.category_names, self.category_codes, category, partial)
+        return mask
+
+    def select(self, mask):
+        return [dict(self.transactions[i]) for i in np.flatnonzero(mask)]
+
+    def totals(self, group_by="category", mask=None):
+        """Sums amounts per category, transaction type or month ("YYYY-MM") over the masked rows."""
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+
+        if group_by == "category":
+            names, codes = self.category_names, self.category_codes
+        elif group_by == "transaction_type":
+            names, codes = self.type_names, self.type_codes
+        elif group_by == "month":
+            mask = mask & ~np.isnat(self.dates)
+            months, codes = np.unique(self.dates[mask].astype('datetime64[M]'), return_inverse=True)
+            names = [str(month) for month in months]
+            cents = np.bincount(codes, weights=self.amount_cents[mask], minlength=len(names))
+            return {name: round(float(total) / 100, 2) for name, total in zip(names, cents)}
+        else:
+            raise ValueError(f"unknown group_by {group_by!r}, expected category, transaction_type or month")
+
+        cents = np.bincount(codes[mask], weights=self.amount_cents[mask], minlength=len(names))
+        counts = np.bincount(codes[mask], minlength=len(names))
+        return {name: round(float(total) / 100, 2) for name, total, count in zip(names, cents, counts) if count}
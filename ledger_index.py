@@ -0,0 +1,250 @@
+import bisect
+import math
+import re
+
+INDEXED_FIELDS = ('category', 'transaction_type', 'date')
+
+
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+APOSTROPHES = re.compile(r"['\u2019]")
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def _index_key(value):
+    return str(value).strip().lower()
+
+
+def _date_key(txn):
+    # Only YYYY-MM-DD dates sort correctly as strings; anything else stays out of the sorted index.
+    date = str(txn['date']).strip()
+    return date if ISO_DATE.match(date) else None
+
+
+class TransactionIndex:
+    """Hash indexes from lowercased category, transaction_type and date to ledger rows.
+
+    Registered as a ledger observer on BudgetSheetsManager, so it is updated on
+    every write instead of being rebuilt. Entries point at the cached
+    transaction dicts themselves (by id), which the cache renumbers in place
+    when rows are deleted, so a delete never has to rewrite the indexes.
+
+    Dates are also kept in a sorted list for range queries: _dates holds the
+    sorted ISO date strings and _by_date the transaction at the same position.
+    _by_id maps each stable transaction id to its dict, whose _row_index is
+    therefore always the row's current position in the sheet.
+    """
+
+    def __init__(self):
+        self._transactions = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._dates = []
+        self._by_date = []
+        self._by_id = {}
+
+    def ledger_reset(self, transactions):
+        self._transactions = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._by_id = {}
+        for txn in transactions:
+            self._add_hashed(txn)
+
+        dated = sorted(
+            ((_date_key(txn), txn) for txn in transactions if _date_key(txn) is not None),
+            key=lambda item: item[0])
+        self._dates = [date for date, txn in dated]
+        self._by_date = [txn for date, txn in dated]
+
+    def ledger_appended(self, transactions):
+        for txn in transactions:
+            self._add(txn)
+
+    def ledger_updated(self, old, new):
+        self._remove(id(new), old)
+        self._add(new)
+
+    def ledger_deleted(self, deleted, row_indices):
+        for txn in deleted:
+            self._remove(id(txn), txn)
+
+    def _add(self, txn):
+        self._add_hashed(txn)
+        date = _date_key(txn)
+        if date is not None:
+            position = bisect.bisect_right(self._dates, date)
+            self._dates.insert(position, date)
+            self._by_date.insert(position, txn)
+
+    def _add_hashed(self, txn):
+        self._transactions[id(txn)] = txn
+        if txn.get('id'):
+            self._by_id[txn['id']] = txn
+        for field in INDEXED_FIELDS:
+            self._indexes[field].setdefault(_index_key(txn[field]), set()).add(id(txn))
+
+    def _remove(self, txn_id, values):
+        self._transactions.pop(txn_id, None)
+        if values.get('id') and id(self._by_id.get(values['id'])) == txn_id:
+            del self._by_id[values['id']]
+        for field in INDEXED_FIELDS:
+            key = _index_key(values[field])
+            ids = self._indexes[field].get(key)
+            if ids is not None:
+                ids.discard(txn_id)
+                if not ids:
+                    del self._indexes[field][key]
+
+        date = _date_key(values)
+        if date is not None:
+            start = bisect.bisect_left(self._dates, date)
+            end = bisect.bisect_right(self._dates, date)
+            for position in range(start, end):
+                if id(self._by_date[position]) == txn_id:
+                    del self._dates[position]
+                    del self._by_date[position]
+                    break
+
+    def get(self, transaction_id):
+        """Returns the cached transaction with this stable id, or None."""
+        return self._by_id.get(transaction_id)
+
+    def lookup(self, **criteria):
+        """Returns the transactions matching every indexed criterion, in sheet order.
+
+        Criteria on fields that aren't indexed are ignored, so callers still
+        have to check those; returns None when no indexed criterion was given.
+        """
+        id_sets = []
+        for field in INDEXED_FIELDS:
+            value = criteria.get(field)
+            if value is not None:
+                id_sets.append(self._indexes[field].get(_index_key(value), set()))
+        if not id_sets:
+            return None
+
+        id_sets.sort(key=len)
+        ids = set(id_sets[0]).intersection(*id_sets[1:])
+        return sorted((self._transactions[txn_id] for txn_id in ids), key=lambda txn: txn['_row_index'])
+
+    def date_range(self, start_date=None, end_date=None):
+        """Returns the transactions dated start_date..end_date inclusive, in sheet order.
+
+        Either bound may be None to leave that side open. Rows whose date
+        isn't YYYY-MM-DD are never returned.
+        """
+        start = bisect.bisect_left(self._dates, start_date) if start_date is not None else 0
+        end = bisect.bisect_right(self._dates, end_date) if end_date is not None else len(self._dates)
+        return sorted(self._by_date[start:end], key=lambda txn: txn['_row_index'])
+
+
+def normalize_description(text):
+    # "Trader Joe's #512" and "trader joes 512" normalize the same; other
+    # punctuation separates words, so "Lyft/Uber Eats" becomes "lyft uber eats".
+    return " ".join(NON_ALPHANUMERIC.sub(" ", APOSTROPHES.sub("", str(text).lower())).split())
+
+
+def _trigrams(normalized, padded=True):
+    # Padding adds word-boundary grams; queries are scored without it so a
+    # match in the middle of a word ("flix" in "netflix") still counts in full.
+    if padded:
+        normalized = f"  {normalized} " if normalized else ""
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+class DescriptionIndex:
+    """Trigram inverted index over transaction descriptions for typo-tolerant lookup.
+
+    Registered as a ledger observer alongside TransactionIndex and keyed the
+    same way, by the id of the cached transaction dict. A lookup scores each
+    candidate by the share of the query's trigrams found in its description,
+    so "trader joes" finds "Trader Joe's Market" and "trder joes" still ranks
+    it first. A description containing the query (after normalizing) always
+    scores 1.0, so "joe" and "flix" find what a substring search would.
+    """
+
+    def __init__(self):
+        self._transactions = {}
+        self._normalized = {}
+        self._grams = {}
+        self._postings = {}
+
+    def ledger_reset(self, transactions):
+        self._transactions = {}
+        self._normalized = {}
+        self._grams = {}
+        self._postings = {}
+        self.ledger_appended(transactions)
+
+    def ledger_appended(self, transactions):
+        for txn in transactions:
+            self._add(txn)
+
+    def ledger_updated(self, old, new):
+        if old['description'] != new['description']:
+            self._remove(id(new))
+            self._add(new)
+
+    def ledger_deleted(self, deleted, row_indices):
+        for txn in deleted:
+            self._remove(id(txn))
+
+    def _add(self, txn):
+        normalized = normalize_description(txn['description'])
+        grams = _trigrams(normalized)
+        self._transactions[id(txn)] = txn
+        self._normalized[id(txn)] = normalized
+        self._grams[id(txn)] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(id(txn))
+
+    def _remove(self, txn_id):
+        self._transactions.pop(txn_id, None)
+        self._normalized.pop(txn_id, None)
+        for gram in self._grams.pop(txn_id, ()):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(txn_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, description, min_score=0.7):
+        """Returns [(score, transaction)] for descriptions resembling description, best first.
+
+        score is the fraction of the query's trigrams present in the
+        description (1.0 when it contains the query outright, give or take
+        punctuation and case). Ties go to the closer overall match, then to
+        sheet order. Queries too short to have a trigram match as substrings.
+        """
+        needle = normalize_description(description)
+        if not needle:
+            return []
+        query = _trigrams(needle, padded=False)
+        padded_query = _trigrams(needle)
+        if not query:
+            candidates = [txn_id for txn_id, normalized in self._normalized.items() if needle in normalized]
+            return self._ranked({txn_id: 1.0 for txn_id in candidates}, padded_query)
+
+        # A description sharing `needed` trigrams must contain at least one of the
+        # len(query) - needed + 1 rarest, so only those postings are scanned.
+        needed = max(1, math.ceil(min_score * len(query)))
+        rarest = sorted(query, key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set().union(*(self._postings.get(gram, ()) for gram in rarest[:len(query) - needed + 1]))
+
+        scores = {}
+        for txn_id in candidates:
+            count = len(query & self._grams[txn_id])
+            if count >= needed:
+                scores[txn_id] = count / len(query)
+        return self._ranked(scores, padded_query)
+
+    def _ranked(self, scores, padded_query):
+        # Ties are broken by similarity against the padded query, which favours
+        # matches at word starts and descriptions close to the query's length.
+        ranked = []
+        for txn_id, score in scores.items():
+            grams = self._grams[txn_id]
+            shared = len(padded_query & grams)
+            similarity = shared / (len(padded_query) + len(grams) - shared)
+            txn = self._transactions[txn_id]
+            ranked.append((score, similarity, txn['_row_index'], txn))
+        ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(score, txn) for score, similarity, row_index, txn in ranked]
@@ -0,0 +1,76 @@
+import re
+
+ISO_MONTH = re.compile(r"^(\d{4}-\d{2})-\d{2}$")
+
+
+def _month_key(txn):
+    match = ISO_MONTH.match(str(txn['date']).strip())
+    return match.group(1) if match else None
+
+
+def _amount_cents(txn):
+    try:
+        return round(float(txn['amount']) * 100)
+    except (TypeError, ValueError):
+        return None
+
+
+class BudgetRollups:
+    """Running totals per (category, month, transaction type), in integer cents.
+
+    Registered as a ledger observer on BudgetSheetsManager, so each add, edit
+    or delete adjusts one or two totals instead of re-summing the ledger.
+    Categories and types are keyed case-insensitively; months are "YYYY-MM",
+    or None for rows whose date isn't YYYY-MM-DD.
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._category_names = {}
+
+    def ledger_reset(self, transactions):
+        self._totals = {}
+        self._category_names = {}
+        self.ledger_appended(transactions)
+
+    def ledger_appended(self, transactions):
+        for txn in transactions:
+            self._apply(txn, 1)
+
+    def ledger_updated(self, old, new):
+        self._apply(old, -1)
+        self._apply(new, 1)
+
+    def ledger_deleted(self, deleted, row_indices):
+        for txn in deleted:
+            self._apply(txn, -1)
+
+    def _apply(self, txn, sign):
+        cents = _amount_cents(txn)
+        if cents is None:
+            return
+        category = str(txn['category']).strip()
+        key = (category.lower(), _month_key(txn), str(txn['transaction_type']).strip().lower())
+        totals = self._totals.setdefault(key, [0, 0])
+        totals[0] += sign * cents
+        totals[1] += sign
+        if totals[1] == 0:
+            del self._totals[key]
+        self._category_names.setdefault(category.lower(), category)
+
+    def category_name(self, category):
+        return self._category_names.get(category.strip().lower(), category.strip())
+
+    def totals(self, month=None, category=None):
+        """Returns {category_key: {transaction_type: amount}} for the month ("YYYY-MM"), or all time if None."""
+        category_key = category.strip().lower() if category is not None else None
+        totals = {}
+        for (key, key_month, transaction_type), (cents, count) in self._totals.items():
+            if month is not None and key_month != month:
+                continue
+            if category_key is not None and key != category_key:
+                continue
+            by_type = totals.setdefault(key, {})
+            by_type[transaction_type] = by_type.get(transaction_type, 0) + cents
+        return {key: {transaction_type: round(cents / 100, 2) for transaction_type, cents in by_type.items()}
+                for key, by_type in totals.items()}
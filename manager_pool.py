@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from budget_tools import BudgetSheetsManager, SingleFlight, ThreadLocalHttp
+
+# Idle tenants are closed, least recently used first, once the cached ledgers
+# of all tenants together take more than this; any tenant unused for
+# DEFAULT_IDLE_TTL seconds is closed regardless.
+DEFAULT_MAX_LEDGER_MB = 512
+DEFAULT_IDLE_TTL = 1800.0
+
+
+class _Tenant:
+    def __init__(self, manager):
+        self.manager = manager
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class ManagerPool:
+    """Process-wide registry of BudgetSheetsManagers, one per spreadsheet.
+
+    Every manager in the pool shares one set of OAuth credentials and one
+    ThreadLocalHttp, so a new tenant costs no auth round trip and reuses open
+    connections; each has its own ledger cache and gateway, but the gateways
+    draw on one shared per-user quota (see sheets_gateway.gateway_for). A new
+    manager starts its background sync when it has a SQLite mirror, and fills
+    in missing transaction ids on a background thread.
+    acquire() returns a warm manager and counts it as in use until release().
+    Tenants nobody holds are closed once idle for idle_ttl seconds, and
+    least recently used first whenever the cached ledgers together exceed
+    max_ledger_bytes (see BudgetSheetsManager.estimated_ledger_bytes).
+
+    Only the default tenant (spreadsheet_id None, or GOOGLE_SPREADSHEET_ID)
+    picks up BUDGET_DB_PATH and BUDGET_JOURNAL_PATH; other tenants get
+    <spreadsheet id>.db and .journal files under db_dir / journal_dir
+    (BUDGET_DB_DIR, BUDGET_JOURNAL_DIR) or go without.
+    """
+
+    def __init__(self, max_ledger_bytes=None, idle_ttl=None, db_dir=None, journal_dir=None, **manager_kwargs):
+        if max_ledger_bytes is None:
+            max_ledger_bytes = float(os.getenv("BUDGET_POOL_MAX_LEDGER_MB", DEFAULT_MAX_LEDGER_MB)) * 1024 * 1024
+        if idle_ttl is None:
+            idle_ttl = os.getenv("BUDGET_POOL_IDLE_TTL", DEFAULT_IDLE_TTL)
+        self.max_ledger_bytes = int(max_ledger_bytes)
+        self.idle_ttl = float(idle_ttl)
+        self.db_dir = db_dir or os.getenv("BUDGET_DB_DIR")
+        self.journal_dir = journal_dir or os.getenv("BUDGET_JOURNAL_DIR")
+        self.manager_kwargs = manager_kwargs
+
+        self._tenants = OrderedDict()  # spreadsheet id -> _Tenant, least recently used first
+        self._lock = threading.Lock()
+        self._creating = SingleFlight()
+        self._transport_lock = threading.Lock()
+        self._creds = None
+        self._http_pool = None
+        self._default_spreadsheet_id = os.getenv("GOOGLE_SPREADSHEET_ID")
+
+    def _shared_transport(self):
+        with self._transport_lock:
+            if self._creds is None:
+                self._creds = BudgetSheetsManager._get_credentials()
+                self._http_pool = ThreadLocalHttp(self._creds)
+            return self._creds, self._http_pool
+
+    def _tenant_path(self, directory, spreadsheet_id, suffix):
+        if spreadsheet_id is None or spreadsheet_id == os.getenv("GOOGLE_SPREADSHEET_ID"):
+            return None  # the manager falls back to the single-tenant env settings
+        if not directory:
+            return ""
+        return os.path.join(directory, f"{spreadsheet_id}{suffix}")
+
+    def _create_manager(self, spreadsheet_id):
+        creds, http_pool = self._shared_transport()
+        manager = BudgetSheetsManager(
+            spreadsheet_id=spreadsheet_id, creds=creds, http_pool=http_pool,
+            db_path=self._tenant_path(self.db_dir, spreadsheet_id, ".db"),
+            journal_path=self._tenant_path(self.journal_dir, spreadsheet_id, ".journal"),
+            **self.manager_kwargs)
+        if manager.db is not None:
+            # Keeps the mirror's budgets and ledger fresh between requests.
+            manager.start_background_sync()
+        # Older sheets have rows without stable ids; fill them in off the request path.
+        threading.Thread(target=manager.ensure_transaction_ids, daemon=True).start()
+        return manager
+
+    def acquire(self, spreadsheet_id=None):
+        """Returns the manager for spreadsheet_id (the default sheet if None), creating it if needed.
+
+        Each acquire() must be paired with a release() of the same manager.
+        """
+        spreadsheet_id = spreadsheet_id or self._default_spreadsheet_id
+        with self._lock:
+            tenant = self._tenants.get(spreadsheet_id) if spreadsheet_id else None
+            if tenant is not None:
+                tenant.leases += 1
+                self._tenants.move_to_end(spreadsheet_id)
+        if tenant is None:
+            started = time.perf_counter()
+            manager = self._creating.do(spreadsheet_id, lambda: self._create_manager(spreadsheet_id))
+            print(f"[TIMING] Budget manager for {manager.spreadsheet_id} ready in {(time.perf_counter() - started) * 1000:.1f} ms")
+            duplicate = None
+            with self._lock:
+                tenant = self._tenants.get(manager.spreadsheet_id)
+                if tenant is None:
+                    tenant = self._tenants[manager.spreadsheet_id] = _Tenant(manager)
+                elif tenant.manager is not manager:
+                    # Another caller registered one first; keep theirs.
+                    duplicate = manager
+                tenant.leases += 1
+                self._tenants.move_to_end(manager.spreadsheet_id)
+                if spreadsheet_id is None:
+                    self._default_spreadsheet_id = manager.spreadsheet_id
+            if duplicate is not None:
+                duplicate.close()
+        self._evict()
+        return tenant.manager
+
+    def release(self, manager):
+        with self._lock:
+            tenant = self._tenants.get(manager.spreadsheet_id)
+            if tenant is not None and tenant.manager is manager:
+                tenant.leases = max(0, tenant.leases - 1)
+                tenant.last_used = time.monotonic()
+        self._evict()
+
+    @contextmanager
+    def lease(self, spreadsheet_id=None):
+        manager = self.acquire(spreadsheet_id)
+        try:
+            yield manager
+        finally:
+            self.release(manager)
+
+    def _evict(self):
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for spreadsheet_id, tenant in list(self._tenants.items()):
+                if tenant.leases == 0 and now - tenant.last_used > self.idle_ttl:
+                    evicted.append(self._tenants.pop(spreadsheet_id))
+            tenants = list(self._tenants.items())
+
+        # Sizing takes each tenant's ledger lock, which a full read can hold for
+        # seconds, so it happens outside the pool lock.
+        sizes = {spreadsheet_id: (tenant, tenant.manager.estimated_ledger_bytes())
+                 for spreadsheet_id, tenant in tenants}
+        with self._lock:
+            # Tenants evicted or replaced meanwhile no longer count; new ones are measured next time.
+            measured = [(spreadsheet_id, tenant, sizes[spreadsheet_id][1])
+                        for spreadsheet_id, tenant in self._tenants.items()
+                        if sizes.get(spreadsheet_id, (None,))[0] is tenant]
+            total = sum(size for _, _, size in measured)
+            for spreadsheet_id, tenant, size in measured:
+                if total <= self.max_ledger_bytes:
+                    break
+                if tenant.leases == 0:
+                    evicted.append(self._tenants.pop(spreadsheet_id))
+                    total -= size
+
+        for tenant in evicted:
+            print(f"[INFO] Evicting budget manager for {tenant.manager.spreadsheet_id}")
+            tenant.manager.close()
+        if total > self.max_ledger_bytes:
+            print(f"[WARN] Cached ledgers use {total / 1024 / 1024:.1f} MB, over the "
+                  f"{self.max_ledger_bytes / 1024 / 1024:.1f} MB cap, but every remaining tenant is in use.")
+
+    def stats(self):
+        with self._lock:
+            tenants = list(self._tenants.items())
+        now = time.monotonic()
+        return {
+            spreadsheet_id: {
+                "leases": tenant.leases,
+                "idle_seconds": now - tenant.last_used,
+                "ledger_bytes": tenant.manager.estimated_ledger_bytes(),
+            }
+            for spreadsheet_id, tenant in tenants
+        }
+
+    def close(self):
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            tenant.manager.close()
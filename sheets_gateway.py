@@ -0,0 +1,199 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from googleapiclient.http import HttpRequest
+
+# Sheets API quotas are 60 read and 60 write requests per minute per user per
+# project. Reads and writes get separate buckets; a short burst is allowed,
+# then requests are paced to the quota.
+DEFAULT_READS_PER_MINUTE = 60
+DEFAULT_WRITES_PER_MINUTE = 60
+DEFAULT_BURST = 10
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 32.0
+
+# 429 is always safe to retry (the request was rejected before running). 5xx
+# may have been applied, so only idempotent methods are retried on those.
+RATE_LIMIT_STATUS = 429
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "PUT")
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate_per_minute, holding at most burst tokens.
+
+    reserve() takes a token straight away and returns how long the caller has
+    to wait before using it, so sync callers sleep and async callers await.
+    """
+
+    def __init__(self, rate_per_minute, burst=DEFAULT_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+def _error_status(error):
+    # HttpError carries an httplib2 response in .resp; httpx errors carry .response.
+    resp = getattr(error, "resp", None)
+    if resp is not None:
+        return getattr(resp, "status", None), resp.get("retry-after")
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code, response.headers.get("retry-after")
+    return None, None
+
+
+class SheetsGateway:
+    """Paces and retries every Sheets request for one spreadsheet.
+
+    Each request takes a token from the read or write bucket first, and 429s
+    (plus 5xx on idempotent requests) are retried with full-jitter exponential
+    backoff, honouring Retry-After when the server sends one. Managers for the
+    same spreadsheet share a gateway through gateway_for(), and gateways for
+    the same user share their buckets, since the quota is per user rather than
+    per spreadsheet. stats() reports how often requests were throttled or retried.
+    """
+
+    def __init__(self, reads_per_minute=None, writes_per_minute=None, burst=DEFAULT_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 read_bucket=None, write_bucket=None):
+        if reads_per_minute is None:
+            reads_per_minute = float(os.getenv("BUDGET_READS_PER_MINUTE", DEFAULT_READS_PER_MINUTE))
+        if writes_per_minute is None:
+            writes_per_minute = float(os.getenv("BUDGET_WRITES_PER_MINUTE", DEFAULT_WRITES_PER_MINUTE))
+        self.read_bucket = read_bucket or TokenBucket(reads_per_minute, burst)
+        self.write_bucket = write_bucket or TokenBucket(writes_per_minute, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._counters = {
+            "requests": 0,
+            "throttled": 0,
+            "throttle_wait_seconds": 0.0,
+            "rate_limited": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+        self._counters_lock = threading.Lock()
+
+    def stats(self):
+        with self._counters_lock:
+            return dict(self._counters)
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def _reserve(self, method):
+        bucket = self.read_bucket if method == "GET" else self.write_bucket
+        wait = bucket.reserve()
+        self._count("requests")
+        if wait > 0:
+            self._count("throttled")
+            self._count("throttle_wait_seconds", wait)
+        return wait
+
+    def _retry_delay(self, error, method, attempt):
+        """Seconds to wait before retrying after error, or None if it shouldn't be retried."""
+        status, retry_after = _error_status(error)
+        if status == RATE_LIMIT_STATUS:
+            self._count("rate_limited")
+        elif not (status in SERVER_ERROR_STATUSES and method in IDEMPOTENT_METHODS):
+            return None
+        if attempt >= self.max_retries:
+            self._count("failed")
+            return None
+
+        self._count("retried")
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        print(f"[WARN] Sheets API returned {status}; retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    def call(self, send, method="GET"):
+        attempt = 0
+        while True:
+            wait = self._reserve(method)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return send()
+            except Exception as e:
+                delay = self._retry_delay(e, method, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, send, method="GET"):
+        attempt = 0
+        while True:
+            wait = self._reserve(method)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await send()
+            except Exception as e:
+                delay = self._retry_delay(e, method, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class GatedHttpRequest(HttpRequest):
+    """googleapiclient HttpRequest whose execute() goes through a SheetsGateway."""
+
+    def __init__(self, gateway, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gateway = gateway
+
+    def execute(self, http=None, num_retries=0):
+        # The gateway does the retrying, so googleapiclient's own retries stay off.
+        return self.gateway.call(lambda: HttpRequest.execute(self, http=http), self.method)
+
+
+_gateways = {}
+_user_buckets = {}
+_gateways_lock = threading.Lock()
+
+
+def gateway_for(spreadsheet_id, user=None):
+    """Returns the process-wide gateway for a spreadsheet, creating it on first use.
+
+    user identifies whose quota the requests count against (None for the
+    process's one OAuth user); every gateway for the same user draws from the
+    same read and write buckets, however many spreadsheets it serves.
+    """
+    with _gateways_lock:
+        gateway = _gateways.get((user, spreadsheet_id))
+        if gateway is None:
+            buckets = _user_buckets.get(user)
+            if buckets is None:
+                gateway = SheetsGateway()
+                _user_buckets[user] = (gateway.read_bucket, gateway.write_bucket)
+            else:
+                gateway = SheetsGateway(read_bucket=buckets[0], write_bucket=buckets[1])
+            _gateways[(user, spreadsheet_id)] = gateway
+        return gateway
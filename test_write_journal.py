@@ -0,0 +1,277 @@
+import os
+import re
+import tempfile
+import unittest
+
+import write_journal
+from budget_tools import BudgetSheetsManager
+from write_journal import WriteJournal
+
+HEADER = ["Date", "Description", "Amount", "Type", "Category", "ID"]
+
+
+class FakeRequest:
+    def __init__(self, call):
+        self.call = call
+
+    def execute(self):
+        return self.call()
+
+
+class FakeSheetsService:
+    """Just enough of the Sheets v4 service for the journal replay paths, held in memory."""
+
+    def __init__(self, rows=()):
+        self.sheets = {"Transactions": [list(HEADER)] + [list(row) for row in rows], "Budgets": [["Category", "Budget Limit"]]}
+        self.sheet_ids = {title: index for index, title in enumerate(self.sheets)}
+        self.appends = 0
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return FakeValues(self)
+
+    def get(self, spreadsheetId=None, fields=None):
+        return FakeRequest(lambda: {"sheets": [{
+            "properties": {"sheetId": self.sheet_ids[title], "title": title,
+                           "gridProperties": {"rowCount": max(1000, len(rows)), "columnCount": 26}}}
+            for title, rows in self.sheets.items()]})
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        def call():
+            for request in body["requests"]:
+                span = request["deleteDimension"]["range"]
+                title = next(title for title, sheet_id in self.sheet_ids.items() if sheet_id == span["sheetId"])
+                del self.sheets[title][span["startIndex"]:span["endIndex"]]
+            return {"replies": []}
+        return FakeRequest(call)
+
+    def read(self, a1_range):
+        title, first_row, last_row = _parse_range(a1_range)
+        rows = self.sheets[title][first_row - 1:last_row]
+        values = [[str(value) for value in row] for row in rows]
+        while values and not any(values[-1]):
+            values.pop()
+        return {"range": a1_range, "values": values} if values else {"range": a1_range}
+
+    def write(self, a1_range, values):
+        title, first_row, _ = _parse_range(a1_range)
+        first_column = ord(re.search(r"!([A-Z])", a1_range).group(1)) - ord("A")
+        for offset, row_values in enumerate(values):
+            row = self.sheets[title][first_row - 1 + offset]
+            row.extend([""] * (first_column + len(row_values) - len(row)))
+            row[first_column:first_column + len(row_values)] = [str(value) for value in row_values]
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, spreadsheetId=None, range=None):
+        return FakeRequest(lambda: self.service.read(range))
+
+    def batchGet(self, spreadsheetId=None, ranges=None):
+        return FakeRequest(lambda: {"valueRanges": [self.service.read(a1_range) for a1_range in ranges]})
+
+    def append(self, spreadsheetId=None, range=None, valueInputOption=None, body=None):
+        def call():
+            title = _parse_range(range)[0]
+            rows = self.service.sheets[title]
+            first_row = len(rows) + 1
+            rows.extend([str(value) for value in row] for row in body["values"])
+            self.service.appends += 1
+            return {"updates": {"updatedRange": f"{title}!A{first_row}:F{len(rows)}"}}
+        return FakeRequest(call)
+
+    def update(self, spreadsheetId=None, range=None, valueInputOption=None, body=None):
+        return FakeRequest(lambda: self.service.write(range, body["values"]) or {})
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        def call():
+            for data in body["data"]:
+                self.service.write(data["range"], data["values"])
+            return {}
+        return FakeRequest(call)
+
+
+def _parse_range(a1_range):
+    title, _, cells = a1_range.partition("!")
+    rows = [int(number) for number in re.findall(r"\d+", cells)]
+    first_row = rows[0] if rows else 1
+    last_row = rows[1] if len(rows) > 1 else (first_row if len(rows) == 1 and ":" not in cells else None)
+    return title.strip("'"), first_row, last_row
+
+
+class FakeServiceManager(BudgetSheetsManager):
+    def __init__(self, service, **kwargs):
+        self.fake_service = service
+        super().__init__(spreadsheet_id="test-sheet", creds=object(), db_path="", journal_path="",
+                         cache_ttl=60, **kwargs)
+
+    def _build_service(self):
+        return self.fake_service
+
+
+class WriteJournalTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_pending_until_done_or_failed(self):
+        journal = WriteJournal(self.path)
+        first = journal.append("add", {"row": ["2025-01-01", "a", 1.0, "Expense", "Food", "id1"]})
+        second = journal.append("modify_budget", {"category": "Food", "budget_limit": 10})
+        third = journal.append("delete", {"rows": []})
+        journal.mark(first, "sending", before=0)
+        journal.mark(second, "done")
+        journal.mark(third, "failed", error="bad")
+        self.assertEqual([(entry["id"], entry["state"], entry["before"]) for entry in journal.pending()],
+                         [(first, "sending", 0)])
+        journal.close()
+
+    def test_reload_keeps_pending_and_skips_torn_line(self):
+        journal = WriteJournal(self.path)
+        kept = journal.append("add", {"row": ["2025-01-01", "a", 1.0, "Expense", "Food", "id1"]})
+        journal.mark(kept, "sending", before=2)
+        done = journal.append("add", {"row": ["2025-01-02", "b", 2.0, "Expense", "Food", "id2"]})
+        journal.mark(done, "done")
+        journal.close()
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write('{"id": "torn", "op": "ad')
+
+        reloaded = WriteJournal(self.path)
+        self.assertEqual([(entry["id"], entry["state"], entry["before"]) for entry in reloaded.pending()],
+                         [(kept, "sending", 2)])
+        added = reloaded.append("add", {"row": ["2025-01-03", "c", 3.0, "Expense", "Food", "id3"]})
+        reloaded.close()
+
+        again = WriteJournal(self.path)
+        self.assertEqual([entry["id"] for entry in again.pending()], [kept, added])
+        again.close()
+
+    def test_compacts_once_nothing_is_pending(self):
+        original = write_journal.COMPACT_AFTER_LINES
+        write_journal.COMPACT_AFTER_LINES = 4
+        self.addCleanup(setattr, write_journal, "COMPACT_AFTER_LINES", original)
+        journal = WriteJournal(self.path)
+        first = journal.append("modify_budget", {"category": "Food", "budget_limit": 1})
+        second = journal.append("modify_budget", {"category": "Food", "budget_limit": 2})
+        journal.mark(first, "done")
+        self.assertGreater(os.path.getsize(self.path), 0)
+        journal.mark(second, "done")
+        self.assertEqual(os.path.getsize(self.path), 0)
+        journal.append("modify_budget", {"category": "Food", "budget_limit": 3})
+        journal.close()
+        with open(self.path, encoding="utf-8") as handle:
+            self.assertEqual(len(handle.readlines()), 1)
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.service = FakeSheetsService([
+            ["2025-01-01", "Rent", "1000", "Expense", "Housing", "id-rent"],
+            ["2025-01-02", "Coffee", "4.5", "Expense", "Food", "id-coffee"],
+            ["2025-01-03", "Coffee", "4.5", "Expense", "Food", ""],
+        ])
+        self.manager = FakeServiceManager(self.service)
+        self.addCleanup(self.manager.close)
+        # Driven by hand instead of by the replay thread.
+        self.manager.journal = WriteJournal(self.path)
+        self.addCleanup(self.manager.journal.close)
+
+    def transactions(self):
+        return [row[:6] for row in self.service.sheets["Transactions"][1:]]
+
+    def test_journaled_add_returns_ids_and_replays(self):
+        result = self.manager.add_transaction("2025-02-01", "Groceries", 30, "Expense", "Food")
+        self.assertEqual(result["status"], "success")
+        self.assertIn("journal_id", result)
+        self.manager._replay_journal()
+        self.assertEqual(self.transactions()[-1][5], result["transaction_id"])
+        self.assertEqual(self.manager.journal.pending(), [])
+
+    def test_sending_add_that_landed_is_not_resent(self):
+        landed = ["2025-02-01", "Groceries", 30.0, "Expense", "Food", "id-landed"]
+        self.service.sheets["Transactions"].append([str(value) for value in landed])
+        journal_id = self.manager.journal.append("add", {"row": landed})
+        self.manager.journal.mark(journal_id, "sending", before=0)
+        self.manager._replay_journal()
+        self.assertEqual(self.service.appends, 0)
+        self.assertEqual(len(self.transactions()), 4)
+        self.assertEqual(self.manager.journal.pending(), [])
+
+    def test_sending_add_without_id_uses_row_counts(self):
+        row = ["2025-01-02", "Coffee", 4.5, "Expense", "Food"]
+        journal_id = self.manager.journal.append("add", {"row": row})
+        # Two such rows were on the sheet before this one was sent, and two still are: it never landed.
+        self.manager.journal.mark(journal_id, "sending", before=2)
+        self.manager._replay_journal()
+        self.assertEqual(self.service.appends, 1)
+        self.assertEqual(len(self.transactions()), 4)
+
+    def test_edit_follows_the_row_id_after_it_moves(self):
+        self.manager._ensure_ledger()
+        self.manager.edit_transaction(3, amount=5)
+        # The row moves up before the journaled edit is replayed.
+        del self.service.sheets["Transactions"][1]
+        self.manager.invalidate_cache()
+        self.manager._replay_journal()
+        self.assertEqual(self.transactions()[0], ["2025-01-02", "Coffee", "5.0", "Expense", "Food", "id-coffee"])
+        self.assertEqual(self.manager.journal.pending(), [])
+
+    def test_edit_of_a_changed_row_is_dropped(self):
+        self.manager._ensure_ledger()
+        self.manager.edit_transaction(3, amount=5)
+        self.service.sheets["Transactions"][2][2] = "6"
+        self.manager.invalidate_cache()
+        self.manager._replay_journal()
+        self.assertEqual(self.transactions()[1][2], "6")
+        self.assertEqual(self.manager.journal.pending(), [])
+
+    def test_delete_relocates_rows_and_skips_missing_ones(self):
+        self.manager._ensure_ledger()
+        self.assertEqual(self.manager.delete_transactions([2, 4])["status"], "success")
+        # A new row ahead of them shifts both down; the id-less duplicate is found by its contents.
+        self.service.sheets["Transactions"].insert(1, ["2024-12-31", "Gift", "20", "Income", "Other", "id-gift"])
+        self.manager.invalidate_cache()
+        self.manager._replay_journal()
+        self.assertEqual([row[5] for row in self.transactions()], ["id-gift", "id-coffee"])
+
+        self.manager.delete_transactions([3])
+        del self.service.sheets["Transactions"][2]
+        self.manager.invalidate_cache()
+        self.manager._replay_journal()
+        self.assertEqual([row[5] for row in self.transactions()], ["id-gift"])
+        self.assertEqual(self.manager.journal.pending(), [])
+
+    def test_journaled_edit_is_visible_before_replay(self):
+        message = self.manager.edit_transaction(3, amount=5)
+        self.assertIn("queued", message)
+        self.assertEqual(self.manager.get_all_transactions()["transactions"][1]["amount"], 5.0)
+        self.assertEqual(self.transactions()[1][2], "4.5")
+        self.manager._replay_journal()
+        self.assertEqual(self.transactions()[1][2], "5.0")
+
+    def test_delete_loads_a_cold_cache_and_rejects_missing_rows(self):
+        self.assertEqual(self.manager.delete_transaction(2)["status"], "success")
+        self.assertEqual(self.manager.delete_transactions([9]), {"status": "error", "message": "Row 9 not found."})
+        self.manager._replay_journal()
+        self.assertEqual([row[1] for row in self.transactions()], ["Coffee", "Coffee"])
+
+    def test_new_budget_category_is_known_before_replay(self):
+        self.manager.modify_budget("Travel", 100)
+        self.assertTrue(self.manager.has_category("travel")["exists"])
+
+    def test_modify_budget_replays(self):
+        self.manager.modify_budget("Food", 200)
+        self.manager._replay_journal()
+        self.assertEqual(self.service.sheets["Budgets"][1:], [["Food", "200.0"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
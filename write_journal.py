@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+# Once this many lines are in the file and nothing is pending, it is rewritten empty.
+COMPACT_AFTER_LINES = 1000
+
+
+class WriteJournal:
+    """Append-only JSON-lines journal of mutations waiting to be written to the sheet.
+
+    Each mutation is one line, {"id", "op", "args", "at"}, fsynced before
+    append() returns, followed later by state lines for the same id:
+    {"id", "state": "sending", ...} just before it is sent, then "done" or
+    "failed". A mutation still "sending" after a restart is in doubt: it may or
+    may not have reached the sheet, and the replayer checks before resending.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lines = 0
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        complete = 0
+        with open(self.path, "rb") as handle:
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    # A torn last line from a crash mid-write; that mutation was never acknowledged.
+                    break
+                complete += len(line)
+                self._lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "op" in record:
+                    self._entries[record["id"]] = dict(record, state="pending")
+                elif record.get("id") in self._entries:
+                    self._apply_state(record)
+        if complete < os.path.getsize(self.path):
+            # Cut it off, or the next append would be written onto the end of it.
+            with open(self.path, "r+b") as handle:
+                handle.truncate(complete)
+                os.fsync(handle.fileno())
+
+    def _apply_state(self, record):
+        if record["state"] in ("done", "failed"):
+            self._entries.pop(record["id"], None)
+        else:
+            self._entries[record["id"]].update(record)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines += 1
+
+    def append(self, op, args):
+        """Durably records a mutation and returns its id."""
+        record = {"id": uuid.uuid4().hex, "op": op, "args": args, "at": time.time()}
+        with self._lock:
+            self._write(record)
+            self._entries[record["id"]] = dict(record, state="pending")
+        return record["id"]
+
+    def mark(self, journal_id, state, **details):
+        record = dict(details, id=journal_id, state=state)
+        with self._lock:
+            if journal_id not in self._entries:
+                return
+            self._write(record)
+            self._apply_state(record)
+            if not self._entries and self._lines >= COMPACT_AFTER_LINES:
+                self._compact()
+
+    def pending(self):
+        """Mutations not yet done or failed, oldest first, each with its latest state."""
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def _compact(self):
+        # Nothing is pending, so the whole history can go; replace the file atomically.
+        self._file.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = 0